@@ -1,6 +1,19 @@
+import os
 import dspy
+from typing import Optional
+from pydantic import BaseModel
 from excel import write_to_db
 
+# Offline-compiled program state, produced by compile_agent.py
+COMPILED_PATH = os.environ.get(
+    "COMPILED_EXCEL_AGENT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "compiled", "excel_agent.json"),
+)
+COMPILED_DIRECT_PATH = os.environ.get(
+    "COMPILED_DIRECT_AGENT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "compiled", "excel_direct_agent.json"),
+)
+
 class ExcelSignature(dspy.Signature):
     """
     You are an Excel agent tasked with reading data from Excel files and allowing users to download extracted data.
@@ -17,6 +30,51 @@ class ExcelSignature(dspy.Signature):
     query: str = dspy.InputField(desc="The query from the user")
     response: str = dspy.OutputField(desc="A message describing whether the operation was successful or not.")
 
+class ContactRecord(BaseModel):
+    Row: Optional[int] = None
+    Organization: str = ""
+    Website: str = ""
+    Employee: str = ""
+    Contact: str = ""
+    Designation: str = ""
+    Email: str = ""
+    Mobile: str = ""
+    Telephone: str = ""
+    Address: str = ""
+    City: str = ""
+    State: str = ""
+    Country: str = ""
+    Industry: str = ""
+    Other: str = ""
+
+class ExtractSignature(dspy.Signature):
+    """
+    You are an Excel agent tasked with extracting contact records from raw Excel rows.
+    Steps:
+    1. Read the raw excel input from the user query.
+    2. Extract these fields for every contact:
+        - Organization, Website, Employee, Contact, Designation, Email, Mobile, Telephone, Address, City, State, Country, Industry, Other.
+        - Extract city, state, country from Address (ex. Leela Tower, Kallai Road, Calicut -> City: Calicut, State: Kerala, Country: India)
+    3. In the "Other" field, include any relevant info (but avoid details like PIN, Fax Number, etc.).
+    4. Leave a field empty if the data does not contain it.
+    """
+    query: str = dspy.InputField(desc="The query from the user, with the rows to extract")
+    records: list[ContactRecord] = dspy.OutputField(desc="One record per contact found in the rows")
+
+class DirectExcelAgent(dspy.Module):
+    """
+    Single-call extraction without tools, the caller writes the returned records.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.extract = dspy.Predict(ExtractSignature)
+
+    def forward(self, query):
+        prediction = self.extract(query=query)
+        records = [record.model_dump() for record in prediction.records]
+        return dspy.Prediction(records=records, response=f"Extracted {len(records)} records")
+
 class ExcelAgent(dspy.Module):
     def __init__(self, tools):
         super().__init__()
@@ -25,7 +83,13 @@ class ExcelAgent(dspy.Module):
     def forward(self, query):
         # The ReAct module handles the reasoning and tool calling
         response = self.react(query=query)
-        return dspy.Prediction(response=response.response)
+        return dspy.Prediction(response=response.response, trajectory=response.trajectory)
 
 analytical_agent_dspy = ExcelAgent(tools=[write_to_db])
+if os.path.exists(COMPILED_PATH):
+    analytical_agent_dspy.load(COMPILED_PATH)
+
+direct_agent_dspy = DirectExcelAgent()
+if os.path.exists(COMPILED_DIRECT_PATH):
+    direct_agent_dspy.load(COMPILED_DIRECT_PATH)
 
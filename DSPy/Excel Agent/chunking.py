@@ -0,0 +1,95 @@
+"""
+Token-aware chunking of spreadsheet rows for the Excel agent.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+# Chunking settings, token counts are estimated from characters
+CHARS_PER_TOKEN = float(os.environ.get("CHARS_PER_TOKEN", 4))
+CHUNK_PROMPT_TOKENS = int(os.environ.get("CHUNK_PROMPT_TOKENS", 6000))
+CHUNK_OUTPUT_TOKENS = int(os.environ.get("CHUNK_OUTPUT_TOKENS", 8000))
+CHUNK_MAX_ROWS = int(os.environ.get("CHUNK_MAX_ROWS", 100))
+# Instructions and field descriptions sent with every chunk
+PROMPT_OVERHEAD_TOKENS = int(os.environ.get("PROMPT_OVERHEAD_TOKENS", 1200))
+# Every output record repeats the 14 field names of ExcelSignature
+OUTPUT_TOKENS_PER_RECORD = int(os.environ.get("OUTPUT_TOKENS_PER_RECORD", 60))
+# LM calls per chunk: ReAct step with write_to_db, finish step and the final extract
+CALLS_PER_CHUNK = int(os.environ.get("CALLS_PER_CHUNK", 3))
+
+# Helper function to estimate tokens from a number of characters
+def estimate_tokens(chars):
+    return np.ceil(np.asarray(chars, dtype=float) / CHARS_PER_TOKEN).astype(int)
+
+# Drop rows and columns without any value, treating blank strings as empty
+def clean_frame(df):
+    blank = df.isna()
+    text = df.select_dtypes(include="object").columns
+    blank[text] = blank[text] | df[text].apply(lambda col: col.astype(str).str.strip().eq(""))
+    cleaned = df.loc[~blank.all(axis=1), ~blank.all(axis=0)]
+    return cleaned.reset_index(drop=True), {
+        "dropped_rows": int(len(df) - len(cleaned)),
+        "dropped_columns": [str(c) for c in df.columns[blank.all(axis=0)]],
+    }
+
+# Estimate prompt and output tokens of every row, as the row would appear in the chunk CSV
+def row_tokens(df):
+    chars = df.fillna("").astype(str).apply(lambda col: col.str.len()).sum(axis=1).to_numpy() + df.shape[1]
+    prompt = estimate_tokens(chars)
+    # Extracted values are mostly copied from the row, plus the field names of each record
+    output = prompt + OUTPUT_TOKENS_PER_RECORD
+    return prompt, output
+
+def plan_chunks(df, prompt_budget=CHUNK_PROMPT_TOKENS, output_budget=CHUNK_OUTPUT_TOKENS,
+                max_rows=CHUNK_MAX_ROWS, calls_per_chunk=CALLS_PER_CHUNK):
+    """
+    Split rows into chunks that fit the prompt and output token budgets.
+
+    Args:
+        df: The cleaned DataFrame to split
+        prompt_budget: The maximum estimated prompt tokens of a chunk, including instructions and header
+        output_budget: The maximum estimated output tokens of a chunk
+        max_rows: The maximum number of rows of a chunk
+        calls_per_chunk: The LM calls expected for each chunk, used for the projection
+
+    Returns:
+        dict: The chunk boundaries with their estimated tokens, and the projected number of LLM calls
+    """
+    header = int(estimate_tokens(sum(len(str(c)) + 1 for c in df.columns)))
+    base = PROMPT_OVERHEAD_TOKENS + header
+    prompt, output = row_tokens(df)
+
+    chunks = []
+    start, prompt_total, output_total = 0, base, 0
+    for i in range(len(df)):
+        rows = i - start
+        if rows and (rows >= max_rows or prompt_total + prompt[i] > prompt_budget
+                     or output_total + output[i] > output_budget):
+            chunks.append({"start": start, "end": i, "prompt_tokens": int(prompt_total), "output_tokens": int(output_total)})
+            start, prompt_total, output_total = i, base, 0
+        prompt_total += prompt[i]
+        output_total += output[i]
+    if len(df) > start:
+        chunks.append({"start": start, "end": len(df), "prompt_tokens": int(prompt_total), "output_tokens": int(output_total)})
+
+    return {
+        "chunks": chunks,
+        "rows": len(df),
+        "prompt_tokens": sum(c["prompt_tokens"] for c in chunks),
+        "output_tokens": sum(c["output_tokens"] for c in chunks),
+        # Rows too large for the budgets on their own still get a chunk
+        "oversized_chunks": sum(1 for c in chunks if c["prompt_tokens"] > prompt_budget or c["output_tokens"] > output_budget),
+        "projected_llm_calls": len(chunks) * calls_per_chunk,
+    }
+
+# Helper function to get the chunk DataFrames of a plan
+def split_chunks(df, plan):
+    return [df.iloc[c["start"]:c["end"]] for c in plan["chunks"]]
+
+# Helper function to show a plan as a table
+def plan_table(plan):
+    return pd.DataFrame([
+        {"chunk": i + 1, "rows": c["end"] - c["start"], "prompt_tokens": c["prompt_tokens"], "output_tokens": c["output_tokens"]}
+        for i, c in enumerate(plan["chunks"])
+    ])
@@ -0,0 +1,139 @@
+"""
+Offline optimization of the ExcelAgent and the DirectExcelAgent.
+
+Bootstraps few-shot demos from a small labelled set so the compiled program
+produces the expected extraction format with fewer iterations, reports score and
+iterations before and after, and saves the compiled state that agent.py loads at
+startup. Each mode has its own state file. Extractions are validated but not
+written to the database while compiling.
+
+Usage:
+    python compile_agent.py --trainset trainset.json
+    python compile_agent.py --mode direct
+    python compile_agent.py --dummy    # offline smoke test with a local dummy LM
+"""
+
+import os
+import json
+import argparse
+import statistics
+import dspy
+import pandas as pd
+from dspy.utils import DummyLM
+import excel
+from agent import ExcelAgent, DirectExcelAgent
+
+MAX_ITERATIONS = 2
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Fields compared against the labels
+KEY_FIELDS = ["Organization", "Email", "City", "State", "Country"]
+
+# Validates the extraction like write_to_db, without writing anything
+def write_to_db(file_content: str):
+    try:
+        df = pd.DataFrame(excel.load_records(file_content))
+        if not excel.EXPECTED_COLUMNS.issubset(df.columns):
+            raise ValueError("Missing expected columns.")
+        return {"status": "success", "message": "Successfully wrote to db"}
+    except Exception as e:
+        return {"status": "error", "message": f"An error occurred while writing to db: {e}"}
+
+# Same name and description as the real tool, so the compiled instructions match at load time
+write_to_db.__doc__ = excel.write_to_db.__doc__
+
+# Load labelled examples: [{"rows": "<csv>", "records": [{...}, ...]}]
+def load_examples(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        dspy.Example(query=f"Extract information from this data:\n{e['rows']}", records=e["records"]).with_inputs("query")
+        for e in data
+    ]
+
+# Number of ReAct tool iterations in a prediction
+def iterations(pred):
+    return sum(1 for key in (getattr(pred, "trajectory", None) or {}) if key.startswith("tool_name_"))
+
+# Records passed to write_to_db in a prediction, or returned by the direct agent
+def written_records(pred):
+    if getattr(pred, "records", None) is not None:
+        return pred.records
+    trajectory = getattr(pred, "trajectory", None) or {}
+    records = []
+    for key, name in trajectory.items():
+        if key.startswith("tool_name_") and name == "write_to_db":
+            args = trajectory.get(key.replace("tool_name_", "tool_args_"), {})
+            try:
+                records += excel.load_records(args.get("file_content", ""))
+            except Exception:
+                continue
+    return records
+
+# Fraction of labelled records whose key fields were extracted exactly
+def metric(example, pred, trace=None):
+    written = {tuple(str(r.get(f, "")).strip().lower() for f in KEY_FIELDS) for r in written_records(pred)}
+    expected = [tuple(str(r.get(f, "")).strip().lower() for f in KEY_FIELDS) for r in example.records]
+    score = sum(r in written for r in expected) / len(expected) if expected else 1.0
+    if trace is not None:
+        return score == 1.0 and iterations(pred) <= MAX_ITERATIONS
+    return score
+
+# Average score and iterations of a program over a dataset, failed examples score 0
+def evaluate(program, dataset):
+    result = dspy.Evaluate(devset=dataset, metric=metric, num_threads=1)(program)
+    return result.score / 100, statistics.mean(iterations(pred) for _, pred, _ in result.results)
+
+# Scripted LM that writes the labelled records, for the examples in the order they are run
+def dummy_lm(examples, mode):
+    answers = []
+    for example in examples:
+        if mode == "direct":
+            answers.append({"records": example.records})
+            continue
+        answers.append({"next_thought": "Write the extracted records.", "next_tool_name": "write_to_db",
+                        "next_tool_args": {"file_content": json.dumps(example.records)}})
+        answers.append({"next_thought": "Done.", "next_tool_name": "finish", "next_tool_args": {}})
+        answers.append({"reasoning": "Records written.", "response": "Successfully wrote to db"})
+    return DummyLM(answers)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trainset", default=os.path.join(BASE_DIR, "trainset.json"))
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--mode", choices=["react", "direct"], default="react",
+                        help="Compile the ReAct agent or the single-call direct agent")
+    parser.add_argument("--dummy", action="store_true", help="Use a local dummy LM instead of Gemini")
+    parser.add_argument("--max-demos", type=int, default=2)
+    args = parser.parse_args()
+
+    # Hold out part of the set for the before/after report when there is enough data
+    examples = load_examples(args.trainset)
+    split = len(examples) // 2 if len(examples) >= 4 else len(examples)
+    trainset, devset = examples[:split], (examples[split:] or examples)
+
+    name = "excel_direct_agent.json" if args.mode == "direct" else "excel_agent.json"
+    if args.dummy:
+        # Evaluated before, bootstrapped, then evaluated after
+        lm = dummy_lm(devset + trainset + devset, args.mode)
+        output = args.output or os.path.join(BASE_DIR, "compiled", f"dummy_{name}")
+    else:
+        lm = dspy.LM("gemini/gemini-2.5-flash", api_key=os.environ.get("GOOGLE_API_KEY"), max_tokens=100000)
+        output = args.output or os.path.join(BASE_DIR, "compiled", name)
+    dspy.settings.configure(lm=lm)
+    program = DirectExcelAgent if args.mode == "direct" else lambda: ExcelAgent(tools=[write_to_db])
+
+    before = evaluate(program(), devset)
+    optimizer = dspy.BootstrapFewShot(metric=metric, max_bootstrapped_demos=args.max_demos, max_labeled_demos=0)
+    compiled = optimizer.compile(program(), trainset=trainset)
+    after = evaluate(compiled, devset)
+
+    # One extract call after the ReAct loop, or the single call of the direct agent
+    for label, (score, iters) in (("Before:", before), ("After: ", after)):
+        print(f"{label} score {score:.2f}, {iters:.2f} iterations, {iters + 1:.2f} LM calls per chunk")
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    compiled.save(output)
+    print(f"Saved compiled agent to {output}")
+
+if __name__ == "__main__":
+    main()
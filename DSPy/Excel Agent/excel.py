@@ -3,14 +3,41 @@ Tool for querying Vertex AI RAG corpora and retrieving relevant information.
 """
 
 import os
+import re
 import pandas as pd
 import logging
 import json
-import sqlite3
+import threading
+from contextlib import contextmanager
+from sink import get_sink, COLUMNS
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+EXPECTED_COLUMNS = set(COLUMNS)
+
+# Helper function to parse JSON records, removing a markdown code fence if the model added one
+def load_records(file_content):
+    text = file_content.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    return json.loads(fenced.group(1) if fenced else text)
+
+# Rows passed to write_to_db are held per thread while buffering, so chunks can be written in order
+write_buffer = threading.local()
+
+@contextmanager
+def buffered_writes():
+    write_buffer.frames = []
+    try:
+        yield write_buffer.frames
+    finally:
+        write_buffer.frames = None
+
+# Helper function to write buffered frames to the DB in one transaction, through the shared writer
+def write_frames(frames):
+    result = get_sink().write(frames)
+    logger.info(f"Successfully wrote {result['inserted']} new rows to db, merged {result['merged']} into existing rows")
+
 def read_file(file_path: str):
     """
     Reads data from an Excel (.xls, .xlsx) or CSV file.
@@ -69,7 +96,7 @@ def write_file(file_content : str):
     """
 
     try:
-        data = json.loads(file_content.strip("```json").strip("```").strip())
+        data = load_records(file_content)
         new_df = pd.DataFrame(data)
 
         file_path = "output.xlsx"
@@ -109,20 +136,36 @@ def write_to_db(file_content : str):
     """
 
     try:
-        data = json.loads(file_content.strip("```json").strip("```").strip())
-        df = pd.DataFrame(data)
-        expected_cols = {'Organization', 'Website', 'Employee', 'Contact', 'Designation', 'Email', 'Mobile', 'Telephone',
-                         'Address', 'City', 'State', 'Country', 'Industry', 'Other'}
-        if not expected_cols.issubset(df.columns):
+        return write_records(load_records(file_content))
+    except Exception as e:
+        logger.error(f"An error occurred while writing to db: {e}")
+        return {
+            "status": "error",
+            "message": f"An error occurred while writing to db: {e}",
+        }
+
+# Helper function to validate extracted records and write them to the DB, or to the buffer when buffering
+def write_records(records):
+    try:
+        df = pd.DataFrame(records)
+        if not EXPECTED_COLUMNS.issubset(df.columns):
             raise ValueError("Missing expected columns.")
 
-        with sqlite3.connect("temp.db") as conn:
-            df.to_sql('data_table', conn, if_exists='append', index=False)
+        # Keep the rows for the caller to write when buffering
+        if getattr(write_buffer, "frames", None) is not None:
+            write_buffer.frames.append(df)
             logger.info("Successfully wrote to db")
             return {
                 "status": "success",
                 "message": "Successfully wrote to db",
             }
+
+        get_sink().write([df])
+        logger.info("Successfully wrote to db")
+        return {
+            "status": "success",
+            "message": "Successfully wrote to db",
+        }
     except Exception as e:
         logger.error(f"An error occurred while writing to db: {e}")
         return {
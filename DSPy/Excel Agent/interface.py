@@ -1,20 +1,57 @@
 import streamlit as st
-from agent import analytical_agent_dspy
+from agent import analytical_agent_dspy, direct_agent_dspy, COMPILED_DIRECT_PATH
+from excel import buffered_writes, write_frames, write_records
+from sink import get_sink, DB_PATH, DB_TABLE, COLUMNS
+from rules import pre_extract, merge_prefilled, resolved_fields, fill_rates, add_row_ids, RULE_FIELDS, OUTPUT_FIELDS, ROW_FIELD
+from chunking import clean_frame, plan_chunks, split_chunks, plan_table, CALLS_PER_CHUNK
+from pipeline import process_chunks, OrderedWriter, EXTRACTION_WORKERS, EXTRACTION_RPM, EXTRACTION_RETRIES
 import sqlite3
+import time
 import pandas as pd
 import dspy
 import os
 
-if not "temp" not in st.session_state:
-    dspy.configure(lm=dspy.LM("gemini/gemini-2.5-flash", api_key=os.environ.get("GOOGLE_API_KEY"),
-                              max_tokens=100000))
-    st.session_state['temp'] = True
+# One LM shared by every rerun, passed to the worker threads through dspy.context
+@st.cache_resource
+def get_lm():
+    return dspy.LM("gemini/gemini-2.5-flash", api_key=os.environ.get("GOOGLE_API_KEY"), max_tokens=100000)
 
 st.title("Excel File Extraction Agent")
 
-def process_chunk(chunk_df, chunk_index):
+# Extraction modes: one typed prediction per chunk, or the ReAct agent calling write_to_db.
+# Direct mode is the default once its compiled state exists.
+EXTRACTION_MODES = ["direct", "react"]
+EXTRACTION_MODE = os.environ.get("EXTRACTION_MODE", "direct" if os.path.exists(COMPILED_DIRECT_PATH) else "react")
+
+# Pipeline settings
+with st.sidebar:
+    mode = st.selectbox("Extraction mode", EXTRACTION_MODES,
+                        index=EXTRACTION_MODES.index(EXTRACTION_MODE) if EXTRACTION_MODE in EXTRACTION_MODES else 0)
+    workers = st.number_input("Parallel workers", min_value=1, max_value=32, value=EXTRACTION_WORKERS)
+    rate = st.number_input("Chunks per minute (0 for no limit)", min_value=0.0, value=EXTRACTION_RPM)
+    retries = st.number_input("Retries per chunk", min_value=0, max_value=10, value=EXTRACTION_RETRIES)
+
+def process_chunk(chunk_df, chunk_index, lm, pre, confident, mode):
     chunk_str = chunk_df.to_csv(index=False)
-    return analytical_agent_dspy(query=f"Extract information from this data:\n{chunk_str}")
+    query = (f"Extract information from this data:\n{chunk_str}\n"
+             f"Include the {ROW_FIELD} value of the source row as a {ROW_FIELD} field in every record.")
+    # Fields the rules already filled for every row are left to them
+    resolved = resolved_fields(pre, chunk_df.index, confident)
+    if resolved:
+        query += f"\nThese fields were already extracted, leave them empty: {', '.join(resolved)}."
+    # Hold the rows the agent writes, so chunks are written in order by the caller
+    with dspy.context(lm=lm), buffered_writes() as frames:
+        if mode == "direct":
+            # Records come back typed and are written here, without a tool call round trip
+            result = direct_agent_dspy(query=query)
+            status = write_records(result.records)
+            if status["status"] != "success":
+                raise RuntimeError(status["message"])
+        else:
+            result = analytical_agent_dspy(query=query)
+    if not frames:
+        raise RuntimeError(f"No rows were extracted: {result.response}")
+    return {"response": result.response, "frames": [merge_prefilled(frame, pre, confident) for frame in frames]}
 
 # Streamlit UI
 file = st.file_uploader("Submit file here", type=["xls", "xlsx"])
@@ -26,23 +63,71 @@ if file and button:
         st.success("File uploaded and read successfully!")
         st.write(df.head())  # Show preview
         with st.spinner("Reading and chunking the Excel file..."):
-            chunk_size = 50
-            chunks = [df[i:i+chunk_size] for i in range(0, len(df), chunk_size)]
-            st.success(f"Split into {len(chunks)} chunks of 50 rows each.")
-
-        all_results = []
-        for idx, chunk in enumerate(chunks):
-            with st.spinner(f"Processing chunk {idx+1} of {len(chunks)}..."):
-                result = process_chunk(chunk, idx+1)
-                all_results.append(f"--- Chunk {idx+1} ---\n{result}\n")
+            # Drop empty rows and columns, then fill what rules can before sizing chunks by estimated tokens
+            df, dropped = clean_frame(df)
+            pre, consumed, confident = pre_extract(df)
+            agent_df = add_row_ids(df.drop(columns=consumed))
+            plan = plan_chunks(agent_df, calls_per_chunk=1 if mode == "direct" else CALLS_PER_CHUNK)
+            chunks = split_chunks(agent_df, plan)
+            st.success(f"Split {plan['rows']} rows into {len(chunks)} chunks, "
+                       f"projected {plan['projected_llm_calls']} LLM calls.")
+            st.caption(f"Dropped {dropped['dropped_rows']} empty rows and {len(dropped['dropped_columns'])} empty columns. "
+                       f"Estimated {plan['prompt_tokens']} prompt and {plan['output_tokens']} output tokens.")
+            if plan["oversized_chunks"]:
+                st.warning(f"{plan['oversized_chunks']} rows exceed the chunk token budget on their own.")
+            rule_rates = fill_rates(pre, RULE_FIELDS)
+            st.caption(f"Rules filled {sum(rule_rates.values()) / len(RULE_FIELDS):.0%} of {', '.join(RULE_FIELDS)}, "
+                       f"{len(consumed)} source columns are not sent to the agent.")
+            with st.expander("Chunk plan"):
+                st.dataframe(plan_table(plan), hide_index=True)
 
+        # Process chunks in parallel, writing completed chunks to the DB in order
+        lm = get_lm()
+        extracted = []
+        def write_chunk(frames):
+            write_frames(frames)
+            extracted.extend(frames)
+        writer = OrderedWriter(write_chunk)
+        all_results = [None] * len(chunks)
+        progress = st.progress(0.0, text=f"Processing {len(chunks)} chunks with {workers} workers...")
         st.subheader("Extraction Results:")
-        st.text("\n".join(all_results))
+        slots = [st.empty() for _ in chunks]
+        t = time.time()
+        done = 0
+        for outcome in process_chunks(chunks, lambda chunk, idx: process_chunk(chunk, idx + 1, lm, pre, confident, mode),
+                                      workers=int(workers), rate_per_minute=rate, retries=int(retries)):
+            idx = outcome["index"]
+            done += 1
+            if outcome["status"] == "success":
+                all_results[idx] = outcome["result"]["response"]
+                writer.add(idx, outcome["result"]["frames"])
+                slots[idx].text(f"--- Chunk {idx+1} ({outcome['seconds']:.1f}s, {outcome['attempts']} attempt(s)) ---\n"
+                                f"{all_results[idx]}")
+            else:
+                all_results[idx] = f"Error: {outcome['error']}"
+                writer.add(idx, None)
+                slots[idx].error(f"Chunk {idx+1} failed after {outcome['attempts']} attempt(s): {outcome['error']}")
+            progress.progress(done / len(chunks), text=f"Processed {done} of {len(chunks)} chunks")
+
+        failed = sum(1 for r in all_results if r.startswith("Error: "))
+        st.success(f"Processed {len(chunks)} chunks in {time.time() - t:.1f}s, {failed} failed.")
+
+        # Fill rate of every field after the rule stage and after the agent
+        final_rates = fill_rates(pd.concat(extracted, ignore_index=True) if extracted else None, OUTPUT_FIELDS)
+        st.subheader("Fill Rates:")
+        st.dataframe(pd.DataFrame({
+            "Field": OUTPUT_FIELDS,
+            "Rules": [rule_rates.get(f) for f in OUTPUT_FIELDS],
+            "After agent": [final_rates[f] for f in OUTPUT_FIELDS],
+        }), hide_index=True)
 
     except Exception as e:
         st.error(f"Error processing Excel file: {e}")
 
 if st.button("Show results:"):
-    with sqlite3.connect("temp.db") as conn:
-        table = pd.read_sql("SELECT * FROM data_table;", conn)
-        st.dataframe(table, hide_index=True)
\ No newline at end of file
+    # Make sure the table exists in the declared schema before reading it
+    get_sink()
+    with sqlite3.connect(DB_PATH) as conn:
+        names = ", ".join(f'"{c}"' for c in COLUMNS)
+        table = pd.read_sql(f'SELECT id, {names} FROM "{DB_TABLE}" ORDER BY id;', conn, index_col="id")
+        st.dataframe(table, hide_index=True)
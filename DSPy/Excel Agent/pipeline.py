@@ -0,0 +1,111 @@
+"""
+Concurrent chunk processing with rate limiting and retries for the Excel agent.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger()
+
+# Extraction pipeline settings
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", 4))
+EXTRACTION_RPM = float(os.environ.get("EXTRACTION_RPM", 60))
+EXTRACTION_RETRIES = int(os.environ.get("EXTRACTION_RETRIES", 3))
+EXTRACTION_BACKOFF = float(os.environ.get("EXTRACTION_BACKOFF", 2.0))
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every worker, allowing `rate_per_minute` starts per minute
+    with bursts of up to `burst`. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Helper function to run one item, retrying with exponential backoff and jitter
+def run_with_retry(fn, index, item, limiter, retries, backoff):
+    t = time.time()
+    error = None
+    for attempt in range(1, retries + 2):
+        limiter.acquire()
+        try:
+            result = fn(item, index)
+            return {"index": index, "status": "success", "result": result, "attempts": attempt,
+                    "error": None, "seconds": time.time() - t}
+        except Exception as e:
+            error = e
+            logger.error(f"Chunk {index + 1} failed on attempt {attempt}: {e}")
+            if attempt <= retries:
+                time.sleep(backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+    return {"index": index, "status": "error", "result": None, "attempts": retries + 1,
+            "error": str(error), "seconds": time.time() - t}
+
+def process_chunks(chunks, fn, workers=EXTRACTION_WORKERS, rate_per_minute=EXTRACTION_RPM,
+                   retries=EXTRACTION_RETRIES, backoff=EXTRACTION_BACKOFF):
+    """
+    Run fn(chunk, index) for every chunk on a pool of workers.
+
+    Args:
+        chunks: The items to process
+        fn: The function to run for each chunk, raising an exception to have it retried
+        workers: The number of chunks processed at the same time
+        rate_per_minute: The maximum number of attempts started per minute, 0 for no limit
+        retries: The number of retries of a failed chunk
+        backoff: The base delay in seconds between retries, doubled after every attempt
+
+    Yields:
+        dict: The outcome of each chunk as it completes, with its index, status, result,
+              attempts, error and seconds
+    """
+    limiter = RateLimiter(rate_per_minute, burst=workers)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(run_with_retry, fn, idx, chunk, limiter, retries, backoff)
+                   for idx, chunk in enumerate(chunks)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class OrderedWriter:
+    """
+    Collects outcomes that complete out of order and writes them in chunk order.
+    """
+
+    def __init__(self, write):
+        self.write = write
+        self.pending = {}
+        self.next_index = 0
+
+    # Add an outcome and write every outcome that is now next in line, returning how many were written
+    def add(self, index, value):
+        self.pending[index] = value
+        written = 0
+        while self.next_index in self.pending:
+            value = self.pending.pop(self.next_index)
+            if value is not None:
+                self.write(value)
+            self.next_index += 1
+            written += 1
+        return written
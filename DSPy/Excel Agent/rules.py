@@ -0,0 +1,261 @@
+"""
+Rule-based extraction of contact fields before the LLM stage of the Excel agent.
+"""
+
+import os
+import re
+import json
+import logging
+import pandas as pd
+
+logger = logging.getLogger()
+
+# Fields of ExcelSignature that rules can fill
+RULE_FIELDS = ["Email", "Website", "Mobile", "Telephone", "City", "State", "Country"]
+OUTPUT_FIELDS = ['Organization', 'Website', 'Employee', 'Contact', 'Designation', 'Email', 'Mobile', 'Telephone',
+                 'Address', 'City', 'State', 'Country', 'Industry', 'Other']
+# Column used to match extracted records back to their source rows
+ROW_FIELD = "Row"
+
+# Normalized column headers that hold a field directly
+FIELD_ALIASES = {
+    "Email": {"email", "e mail", "email id", "email address", "mail", "mail id"},
+    "Website": {"website", "web", "web site", "url", "homepage", "web address"},
+    "Mobile": {"mobile", "mobile no", "mobile number", "cell", "cell no", "cell phone", "mob"},
+    "Telephone": {"telephone", "phone", "phone no", "phone number", "tel", "tel no", "landline", "office phone"},
+    "City": {"city", "town"},
+    "State": {"state", "province"},
+    "Country": {"country"},
+}
+ADDRESS_ALIASES = {"address", "addr", "postal address", "office address", "location", "full address"}
+
+EMAIL_RE = r"([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,})"
+WEBSITE_RE = r"((?:https?://|www\.)[A-Za-z0-9.-]+\.[A-Za-z]{2,}(?:/[^\s,;|]*)?)"
+DOMAIN_RE = r"^\s*((?:https?://)?(?:www\.)?[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}(?:/\S*)?)\s*$"
+PHONE_RE = r"(\+?\d[\d \-()./]{5,}\d)"
+DATE_RE = r"^(?:\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4})$"
+
+# Built-in gazetteer, extended or overridden by the JSON file at GAZETTEER_PATH
+GAZETTEER_PATH = os.environ.get("GAZETTEER_PATH")
+GAZETTEER = {
+    "cities": {
+        "Mumbai": "Maharashtra", "Bombay": "Maharashtra", "Pune": "Maharashtra", "Nagpur": "Maharashtra",
+        "Nashik": "Maharashtra", "Thane": "Maharashtra", "Aurangabad": "Maharashtra",
+        "Delhi": "Delhi", "New Delhi": "Delhi", "Gurgaon": "Haryana", "Gurugram": "Haryana", "Faridabad": "Haryana",
+        "Noida": "Uttar Pradesh", "Lucknow": "Uttar Pradesh", "Kanpur": "Uttar Pradesh", "Agra": "Uttar Pradesh",
+        "Varanasi": "Uttar Pradesh", "Ghaziabad": "Uttar Pradesh",
+        "Bangalore": "Karnataka", "Bengaluru": "Karnataka", "Mysore": "Karnataka", "Mysuru": "Karnataka",
+        "Mangalore": "Karnataka", "Hubli": "Karnataka",
+        "Chennai": "Tamil Nadu", "Madras": "Tamil Nadu", "Coimbatore": "Tamil Nadu", "Madurai": "Tamil Nadu",
+        "Tiruchirappalli": "Tamil Nadu", "Salem": "Tamil Nadu",
+        "Hyderabad": "Telangana", "Secunderabad": "Telangana", "Warangal": "Telangana",
+        "Visakhapatnam": "Andhra Pradesh", "Vijayawada": "Andhra Pradesh", "Guntur": "Andhra Pradesh",
+        "Kolkata": "West Bengal", "Calcutta": "West Bengal", "Howrah": "West Bengal", "Durgapur": "West Bengal",
+        "Ahmedabad": "Gujarat", "Surat": "Gujarat", "Vadodara": "Gujarat", "Baroda": "Gujarat", "Rajkot": "Gujarat",
+        "Jaipur": "Rajasthan", "Jodhpur": "Rajasthan", "Udaipur": "Rajasthan", "Kota": "Rajasthan",
+        "Bhopal": "Madhya Pradesh", "Indore": "Madhya Pradesh", "Gwalior": "Madhya Pradesh", "Jabalpur": "Madhya Pradesh",
+        "Patna": "Bihar", "Ranchi": "Jharkhand", "Jamshedpur": "Jharkhand", "Bhubaneswar": "Odisha", "Cuttack": "Odisha",
+        "Raipur": "Chhattisgarh", "Guwahati": "Assam", "Chandigarh": "Chandigarh", "Ludhiana": "Punjab",
+        "Amritsar": "Punjab", "Jalandhar": "Punjab", "Dehradun": "Uttarakhand", "Shimla": "Himachal Pradesh",
+        "Srinagar": "Jammu and Kashmir", "Jammu": "Jammu and Kashmir", "Panaji": "Goa", "Margao": "Goa",
+        "Calicut": "Kerala", "Kozhikode": "Kerala", "Kochi": "Kerala", "Cochin": "Kerala", "Ernakulam": "Kerala",
+        "Thiruvananthapuram": "Kerala", "Trivandrum": "Kerala", "Thrissur": "Kerala", "Kannur": "Kerala",
+        "Kollam": "Kerala", "Palakkad": "Kerala", "Puducherry": "Puducherry", "Pondicherry": "Puducherry",
+    },
+    "states": {
+        "Andhra Pradesh": "India", "Arunachal Pradesh": "India", "Assam": "India", "Bihar": "India",
+        "Chhattisgarh": "India", "Goa": "India", "Gujarat": "India", "Haryana": "India", "Himachal Pradesh": "India",
+        "Jharkhand": "India", "Karnataka": "India", "Kerala": "India", "Madhya Pradesh": "India",
+        "Maharashtra": "India", "Manipur": "India", "Meghalaya": "India", "Mizoram": "India", "Nagaland": "India",
+        "Odisha": "India", "Punjab": "India", "Rajasthan": "India", "Sikkim": "India", "Tamil Nadu": "India",
+        "Telangana": "India", "Tripura": "India", "Uttar Pradesh": "India", "Uttarakhand": "India",
+        "West Bengal": "India", "Delhi": "India", "Jammu and Kashmir": "India", "Ladakh": "India",
+        "Chandigarh": "India", "Puducherry": "India",
+    },
+    "countries": [
+        "India", "United States", "USA", "United Kingdom", "UK", "United Arab Emirates", "UAE", "Singapore",
+        "Canada", "Australia", "Germany", "France", "Japan", "China", "Saudi Arabia", "Qatar", "Oman", "Kuwait",
+        "Bahrain", "Sri Lanka", "Nepal", "Bangladesh", "Malaysia", "Netherlands", "Switzerland", "Italy", "Spain",
+    ],
+}
+COUNTRY_NAMES = {"USA": "United States", "UK": "United Kingdom", "UAE": "United Arab Emirates"}
+
+# Helper function to load the gazetteer, merging in a local JSON file if configured
+def load_gazetteer(path=GAZETTEER_PATH):
+    gazetteer = {"cities": dict(GAZETTEER["cities"]), "states": dict(GAZETTEER["states"]),
+                 "countries": list(GAZETTEER["countries"])}
+    if path and os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                extra = json.load(f)
+            gazetteer["cities"].update(extra.get("cities", {}))
+            gazetteer["states"].update(extra.get("states", {}))
+            gazetteer["countries"] += [c for c in extra.get("countries", []) if c not in gazetteer["countries"]]
+        except Exception as e:
+            logger.error(f"Error loading gazetteer from {path}: {e}")
+    return gazetteer
+
+gazetteer = load_gazetteer()
+
+# Helper function to build a case-insensitive whole-word alternation, longest names first
+def names_pattern(names):
+    return r"(?i)\b(" + "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True)) + r")\b"
+
+# Helper function to normalize a column header for alias matching
+def normalize_header(name):
+    return " ".join(re.findall(r"[a-z0-9]+", str(name).lower()))
+
+# Map each rule field, and the address, to a source column when the header names it
+def map_columns(df):
+    mapping = {}
+    for col in df.columns:
+        header = normalize_header(col)
+        for field, aliases in FIELD_ALIASES.items():
+            if header in aliases and field not in mapping:
+                mapping[field] = col
+        if header in ADDRESS_ALIASES and "Address" not in mapping:
+            mapping["Address"] = col
+    return mapping
+
+# Helper function to canonicalize gazetteer matches, e.g. "calicut" -> "Calicut"
+def canonical(matches, names):
+    lookup = {n.lower(): n for n in names}
+    return matches.str.lower().map(lookup)
+
+# Helper function to split phone numbers into mobile and landline
+def classify_phones(numbers):
+    mobile, telephone = None, None
+    for number in numbers if isinstance(numbers, list) else []:
+        number = number.strip()
+        if re.match(DATE_RE, number):
+            continue
+        digits = re.sub(r"\D", "", number)
+        national = re.sub(r"^(?:91|0)", "", digits) if len(digits) > 10 else digits
+        if len(national) == 10 and national[0] in "6789":
+            mobile = mobile or number
+        # Bare digit runs in free text are as likely to be amounts or ids, so landlines need a prefix or separators
+        elif 7 <= len(digits) <= 13 and (number[0] in "+0" or re.search(r"[ \-()./]", number)):
+            telephone = telephone or number
+    return mobile, telephone
+
+# Helper function to render cells as text, without the ".0" pandas adds to integer values in float columns
+def render_text(df):
+    text = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values) and values.dropna().mod(1).eq(0).all():
+            values = values.astype("Int64")
+        text[col] = values.astype(object).where(values.notna(), "").astype(str)
+    return pd.DataFrame(text, index=df.index)
+
+# Helper function to join the text of some columns into one string per row
+def join_columns(text, columns):
+    if not columns:
+        return pd.Series("", index=text.index)
+    return text[columns[0]].str.cat([text[c] for c in columns[1:]], sep=" | ")
+
+# Add the Row column used to match records to source rows, renaming a sheet column of the same name
+def add_row_ids(df):
+    df = df.copy()
+    if ROW_FIELD in df.columns:
+        name = f"{ROW_FIELD} (source)"
+        while name in df.columns:
+            name += "_"
+        df = df.rename(columns={ROW_FIELD: name})
+    df.insert(0, ROW_FIELD, df.index)
+    return df
+
+def pre_extract(df):
+    """
+    Fill contact fields with patterns and a gazetteer lookup.
+
+    Args:
+        df: The cleaned spreadsheet rows
+
+    Returns:
+        tuple: A DataFrame of RULE_FIELDS per row, with "" where nothing was found, the source
+               columns whose values were fully captured by the rules, and the fields read from
+               their own columns or exact patterns, which take precedence over the agent
+    """
+    mapping = map_columns(df)
+    text = render_text(df)
+    row_text = join_columns(text, list(text.columns))
+    pre = pd.DataFrame("", index=df.index, columns=RULE_FIELDS)
+    # Fields taken from a column named for them, or from an exact pattern
+    confident = {field for field in RULE_FIELDS if field in mapping} | {"Email"}
+
+    # Email and website, from their own columns when present, otherwise anywhere in the row
+    email_source = text[mapping["Email"]] if "Email" in mapping else row_text
+    pre["Email"] = email_source.str.extract(EMAIL_RE, expand=False).fillna("")
+    if "Website" in mapping:
+        pre["Website"] = text[mapping["Website"]].str.extract(DOMAIN_RE, expand=False).fillna("")
+    else:
+        pre["Website"] = row_text.str.extract(WEBSITE_RE, expand=False).fillna("")
+
+    # Phone numbers, classified by shape unless the column says what they are
+    for field in ("Mobile", "Telephone"):
+        if field in mapping:
+            pre[field] = text[mapping[field]].str.extract(PHONE_RE, expand=False).fillna("").str.strip()
+    unmapped = [f for f in ("Mobile", "Telephone") if f not in mapping]
+    if unmapped:
+        # Columns already mapped to a field are not scanned again
+        mapped = set(mapping.values())
+        phone_text = join_columns(text, [c for c in text.columns if c not in mapped]).str.replace(EMAIL_RE, " ", regex=True)
+        classified = phone_text.str.findall(PHONE_RE).map(classify_phones)
+        for i, field in enumerate(("Mobile", "Telephone")):
+            if field in unmapped:
+                pre[field] = classified.str[i].fillna("")
+
+    # City, state and country from their own columns, or from address and place columns via the gazetteer.
+    # Other text such as organization names ("Bank of Baroda") or email domains is never looked up.
+    places = [mapping[f] for f in ("Address", "City", "State", "Country") if f in mapping]
+    address = join_columns(text, places).str.replace(EMAIL_RE, " ", regex=True).str.replace(WEBSITE_RE, " ", regex=True)
+    cities, states, countries = gazetteer["cities"], gazetteer["states"], gazetteer["countries"]
+    city = canonical(address.str.extract(names_pattern(cities), expand=False), cities)
+    state = canonical(address.str.extract(names_pattern(states), expand=False), states)
+    state = state.fillna(city.map(cities))
+    country = canonical(address.str.extract(names_pattern(countries), expand=False), countries).replace(COUNTRY_NAMES)
+    # Drop city and state when the country found contradicts them, leaving them to the agent
+    conflict = country.notna() & state.map(states).notna() & country.ne(state.map(states))
+    city, state = city.mask(conflict), state.mask(conflict)
+    country = country.fillna(state.map(states))
+    for field, values in (("City", city), ("State", state), ("Country", country)):
+        if field in mapping:
+            pre[field] = text[mapping[field]].str.strip()
+        else:
+            pre[field] = values.fillna("")
+
+    # Source columns that only held a rule field and were fully captured
+    consumed = [mapping[f] for f in RULE_FIELDS
+                if f in mapping and (pre[f].ne("") | text[mapping[f]].str.strip().eq("")).all()]
+    return pre, consumed, confident
+
+# Fill the fields of extracted records from the rule stage, matching on the Row column.
+# Confident rule values replace the agent's, heuristic ones only fill fields the agent left empty.
+def merge_prefilled(records, pre, confident):
+    if ROW_FIELD not in records.columns:
+        return records
+    rows = pd.to_numeric(records[ROW_FIELD], errors="coerce")
+    matched = pre.reindex(rows.to_numpy())
+    merged = records.drop(columns=[ROW_FIELD]).reset_index(drop=True)
+    for field in RULE_FIELDS:
+        values = pd.Series(matched[field].fillna("").to_numpy(), index=merged.index)
+        current = merged[field] if field in merged.columns else pd.Series("", index=merged.index)
+        current = current.fillna("").astype(str)
+        use_rule = values.ne("") if field in confident else values.ne("") & current.str.strip().eq("")
+        merged[field] = values.where(use_rule, current)
+    return merged
+
+# Fraction of non-empty values of each field
+def fill_rates(frame, fields):
+    if frame is None or not len(frame):
+        return {field: 0.0 for field in fields}
+    return {
+        field: float(frame[field].fillna("").astype(str).str.strip().ne("").mean()) if field in frame.columns else 0.0
+        for field in fields
+    }
+
+# Confident fields the rules filled for every row of a chunk, which the agent can leave empty
+def resolved_fields(pre, rows, confident):
+    chunk = pre.loc[rows]
+    return [field for field in RULE_FIELDS if field in confident and len(chunk) and chunk[field].ne("").all()]
@@ -0,0 +1,233 @@
+"""
+Persistent SQLite writer for extracted contact records.
+"""
+
+import os
+import queue
+import atexit
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger()
+
+# SQLite sink settings
+DB_PATH = os.environ.get("DB_PATH", "temp.db")
+DB_TABLE = os.environ.get("DB_TABLE", "data_table")
+# Columns that identify a contact, rows with the same non-empty values in all of them are merged instead of duplicated
+DB_NATURAL_KEY = [c.strip() for c in os.environ.get("DB_NATURAL_KEY", "Email,Organization").split(",") if c.strip()]
+DB_BATCH_ROWS = int(os.environ.get("DB_BATCH_ROWS", 5000))
+
+COLUMNS = ['Organization', 'Website', 'Employee', 'Contact', 'Designation', 'Email', 'Mobile', 'Telephone',
+           'Address', 'City', 'State', 'Country', 'Industry', 'Other']
+# Hash of the normalized row, set only for rows missing a natural key value so exact repeats of them are skipped
+ROW_KEY = "row_key"
+
+
+class SQLiteSink:
+    """
+    Single writer thread that owns one WAL-mode connection. Producers on any thread
+    queue frames and get a Future that completes once their rows are committed, with
+    the number of rows inserted and the number merged into existing contacts.
+    Queued frames are written together in one transaction with executemany.
+    Rows with every natural key value are merged on the key, other rows are only
+    skipped when an identical row was already written.
+    """
+
+    def __init__(self, path, table, natural_key, batch_rows):
+        unknown = [c for c in natural_key if c not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Natural key columns {unknown} are not in the schema")
+        self.path = path
+        self.table = table
+        self.natural_key = natural_key
+        self.batch_rows = batch_rows
+        self.queue = queue.Queue()
+        self.ready = Future()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        # Surface schema errors to the caller that created the sink
+        self.ready.result()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    # Create the declared schema, moving rows of a table created by older versions into it
+    def _create_schema(self, conn):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{self.table}")')]
+        legacy = None
+        if columns and "id" not in columns:
+            legacy = f"{self.table}_legacy"
+            conn.execute(f'ALTER TABLE "{self.table}" RENAME TO "{legacy}"')
+            logger.info(f"Migrating {self.table} to the declared schema")
+
+        definitions = ", ".join(f'"{c}" TEXT NOT NULL DEFAULT \'\'' for c in COLUMNS)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" (id INTEGER PRIMARY KEY, {definitions}, "{ROW_KEY}" TEXT)')
+        if ROW_KEY not in [row[1] for row in conn.execute(f'PRAGMA table_info("{self.table}")')]:
+            conn.execute(f'ALTER TABLE "{self.table}" ADD COLUMN "{ROW_KEY}" TEXT')
+        if self.natural_key:
+            # Rows missing any key value are always inserted, e.g. several people at one company without emails
+            index = f"{self.table}_natural_key"
+            sql = (f'CREATE UNIQUE INDEX "{index}" ON "{self.table}" '
+                   f'({self.key_list()}) WHERE {self.key_present()}')
+            existing = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (index,)).fetchone()
+            if existing and existing[0] != sql:
+                conn.execute(f'DROP INDEX "{index}"')
+                existing = None
+            if not existing:
+                conn.execute(sql)
+
+        if legacy:
+            existing = [row[1] for row in conn.execute(f'PRAGMA table_info("{legacy}")')]
+            select = ", ".join(f'COALESCE(CAST("{c}" AS TEXT), \'\')' if c in existing else "''" for c in COLUMNS)
+            conn.execute(f'{self.insert_head()} SELECT {select} FROM "{legacy}" WHERE true '
+                         f'{self.conflict_sql(skip_repeats=False)}')
+            conn.execute(f'DROP TABLE "{legacy}"')
+        self._backfill_row_keys(conn)
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{self.table}_{ROW_KEY}" ON "{self.table}" ("{ROW_KEY}")')
+        conn.commit()
+
+    # Set the row key of rows written before it existed, removing the repeats it would reject
+    def _backfill_row_keys(self, conn):
+        missing = f'"{ROW_KEY}" IS NULL AND NOT ({self.key_present()})' if self.natural_key else f'"{ROW_KEY}" IS NULL'
+        names = ", ".join(f'"{c}"' for c in COLUMNS)
+        rows = conn.execute(f'SELECT id, {names} FROM "{self.table}" WHERE {missing} ORDER BY id').fetchall()
+        if not rows:
+            return
+        keys = {key for (key,) in conn.execute(f'SELECT "{ROW_KEY}" FROM "{self.table}" WHERE "{ROW_KEY}" IS NOT NULL')}
+        updates, repeats = [], []
+        for row in rows:
+            key = self.row_key(row[1:])
+            if key in keys:
+                repeats.append((row[0],))
+            else:
+                keys.add(key)
+                updates.append((key, row[0]))
+        conn.executemany(f'UPDATE "{self.table}" SET "{ROW_KEY}" = ? WHERE id = ?', updates)
+        conn.executemany(f'DELETE FROM "{self.table}" WHERE id = ?', repeats)
+        logger.info(f"Set row keys of {len(updates)} rows of {self.table}, removed {len(repeats)} repeated rows")
+
+    def key_list(self):
+        return ", ".join(f'"{c}"' for c in self.natural_key)
+
+    def key_present(self):
+        return " AND ".join(f"\"{c}\" != ''" for c in self.natural_key)
+
+    # Hash of a row of COLUMNS values, None when the natural key is complete and decides instead
+    def row_key(self, row):
+        values = dict(zip(COLUMNS, row))
+        if self.natural_key and all(values[c] != "" for c in self.natural_key):
+            return None
+        normalized = "\x1f".join(" ".join(str(v).split()).lower() for v in row)
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+    # Upsert clauses: merge on a complete natural key, and skip exact repeats of other rows
+    def conflict_sql(self, skip_repeats=True):
+        repeats = f'ON CONFLICT("{ROW_KEY}") DO NOTHING' if skip_repeats else ""
+        if not self.natural_key:
+            return repeats
+        updates = ", ".join(
+            f'"{c}" = CASE WHEN excluded."{c}" != \'\' THEN excluded."{c}" ELSE "{self.table}"."{c}" END'
+            for c in COLUMNS if c not in self.natural_key
+        )
+        return f"ON CONFLICT({self.key_list()}) WHERE {self.key_present()} DO UPDATE SET {updates} {repeats}"
+
+    def insert_head(self, row_key=False):
+        names = ", ".join(f'"{c}"' for c in COLUMNS + ([ROW_KEY] if row_key else []))
+        return f'INSERT INTO "{self.table}" ({names})'
+
+    def insert_sql(self):
+        return f'{self.insert_head(row_key=True)} VALUES ({", ".join("?" for _ in COLUMNS + [ROW_KEY])})'
+
+    # Helper function to convert a frame to rows of the declared columns, as text
+    @staticmethod
+    def to_rows(df):
+        frame = df.reindex(columns=COLUMNS)
+        frame = frame.astype(object).where(frame.notna(), "").astype(str).apply(lambda col: col.str.strip())
+        return list(frame.itertuples(index=False, name=None))
+
+    def _run(self):
+        try:
+            conn = self._connect()
+            self._create_schema(conn)
+            self.ready.set_result(True)
+        except Exception as e:
+            self.ready.set_exception(e)
+            return
+
+        sql = f"{self.insert_sql()} {self.conflict_sql()}"
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            # Take everything already queued, up to the batch size, into one transaction
+            batch = [item]
+            rows = len(item[0])
+            while rows < self.batch_rows:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            try:
+                results = []
+                with conn:
+                    for data, _ in batch:
+                        # Only the writer inserts, so new rows are the ids past the previous maximum
+                        before = self.max_id(conn)
+                        conn.executemany(sql, data)
+                        inserted = self.max_id(conn) - before
+                        results.append({"inserted": inserted, "merged": len(data) - inserted})
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+                logger.info(f"Committed {rows} rows from {len(batch)} write(s) to {self.table}, "
+                            f"{sum(r['merged'] for r in results)} merged into existing rows")
+            except Exception as e:
+                logger.error(f"An error occurred while writing to db: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+        conn.close()
+
+    def max_id(self, conn):
+        return conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{self.table}"').fetchone()[0]
+
+    def submit(self, frames):
+        """Queue frames for writing and return a Future with the rows inserted and merged."""
+        future = Future()
+        rows = [row + (self.row_key(row),) for df in frames for row in self.to_rows(df)]
+        if not rows:
+            future.set_result({"inserted": 0, "merged": 0})
+        else:
+            self.queue.put((rows, future))
+        return future
+
+    def write(self, frames):
+        """Write frames and wait until they are committed, returning the rows inserted and merged."""
+        return self.submit(frames).result()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+sink = None
+sink_lock = threading.Lock()
+
+# Helper function to get the shared sink, created on first use
+def get_sink():
+    global sink
+    with sink_lock:
+        if sink is None:
+            sink = SQLiteSink(DB_PATH, DB_TABLE, DB_NATURAL_KEY, DB_BATCH_ROWS)
+            atexit.register(sink.close)
+        return sink
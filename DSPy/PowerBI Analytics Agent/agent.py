@@ -1,17 +1,36 @@
+import os
+import asyncio
 import dspy
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Callable, Sequence
+from tracking import CallRecorder
+
+# Worker pool shared by every DSPyAgentApp in the process
+_executor = None
+
+def shared_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dspy_agent")
+    return _executor
 
 # Define DSPy Signature and Program
 class AnalyticalSignature(dspy.Signature):
     """
     You are a PowerBI Analytics agent assisting with interpreting trends and insights
-    in a user database. You should use the `powerbi_metadata` tool to understand the
-    data source, and the `dax_query` tool to execute a query. Return both a textual
+    in a user database. You should use the `powerbi_schema` tool with the question to
+    understand the relevant part of the data source, falling back to `powerbi_metadata`
+    only if something you need is missing, and the `dax_query` tool to execute a query.
+    When several independent queries are needed, run them together with `dax_queries`.
+    Large query results are summarized; to chart one, reference its handle instead of copying
+    rows: {"handle": "<handle>", "type": "line", "x": "<column>", "y": ["<column>", ...]} plus
+    any other Highcharts options such as title. Use `dax_result` only to read rows you need for
+    the analysis. Return both a textual
     analysis with insights and/or recommendations, and Highcharts formatted JSON visuals.
     """
     query: str = dspy.InputField(desc="The user's analytics question")
     text_result: str = dspy.OutputField(desc="Summary of findings and suggestions")
-    charts: str = dspy.OutputField(desc="HighCharts-compatible chart JSON if needed")
+    charts: str = dspy.OutputField(desc="HighCharts-compatible chart JSON if needed, charts may reference a result handle")
 
 class AnalyticalAgent(dspy.Module):
     def __init__(self, tools):
@@ -22,7 +41,8 @@ class AnalyticalAgent(dspy.Module):
         response = self.react(query=query)
         return dspy.Prediction(
             text_result=response.text_result,
-            charts=response.charts
+            charts=response.charts,
+            trajectory=response.trajectory,
         )
 
 class DSPyAgentApp:
@@ -32,26 +52,58 @@ class DSPyAgentApp:
             tools: Sequence[Callable],
             project: str,
             location: str,
+            max_workers: int = 8,
+            compiled_path: str = os.environ.get(
+                "COMPILED_AGENT_PATH",
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), "compiled", "analytical_agent.json"),
+            ),
     ):
         self.name = name
         self.tools = tools
         self.project = project
         self.location = location
+        self.max_workers = max_workers
+        self.compiled_path = compiled_path
+        self.agent = None
 
     def set_up(self):
         import vertexai
         vertexai.init(project=self.project, location=self.location)
-        dspy.settings.configure(lm=dspy.LM("vertexai/gemini-2.5-flash"))
+        # The LM is applied per request with dspy.context, so worker threads never touch global settings
+        self.lm = dspy.LM("vertexai/gemini-2.5-flash")
         self.agent = AnalyticalAgent(tools=self.tools)
+        # Load the offline-compiled program (see compile_agent.py) if one has been saved
+        if self.compiled_path and os.path.exists(self.compiled_path):
+            self.agent.load(self.compiled_path)
+            print(f"Loaded compiled agent from {self.compiled_path}")
+        self.executor = shared_executor(self.max_workers)
+
+    def _run(self, query: str, lm_kwargs: dict):
+        # A fresh LM copy per request keeps its call history separate for usage tracking
+        lm = self.lm.copy(**lm_kwargs)
+        recorder = CallRecorder()
+        with dspy.context(lm=lm, callbacks=[recorder]):
+            result = self.agent(query=query)
+        return {
+            "text": result.text_result,
+            "charts": result.charts,
+            "usage": recorder.summary(),
+        }
 
-    def query(self, query: str):
+    def query(self, query: str, **lm_kwargs):
         # We call the forward method of our DSPy agent here.
         if not self.agent:
             print("Error: Agent not set up. Please call `set_up()` first.")
             return {"text": "Agent not initialized.", "charts": "[]"}
 
-        result = self.agent.forward(query=query)
-        return {
-            "text": result.text_result,
-            "charts": result.charts
-        }
\ No newline at end of file
+        return self._run(query, lm_kwargs)
+
+    def submit(self, query: str, **lm_kwargs) -> Future:
+        # Queue the query on the shared worker pool
+        if not self.agent:
+            raise RuntimeError("Agent not set up. Please call `set_up()` first.")
+        return self.executor.submit(self._run, query, lm_kwargs)
+
+    async def aquery(self, query: str, **lm_kwargs):
+        # Await a query without blocking the event loop
+        return await asyncio.wrap_future(self.submit(query, **lm_kwargs))
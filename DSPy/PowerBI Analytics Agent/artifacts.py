@@ -0,0 +1,84 @@
+"""
+Content-addressed store for chart HTML, tables and CSV exports shown in the chatbot.
+"""
+
+import os
+import io
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+logger = logging.getLogger()
+
+# Artifact store settings
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", ".artifacts")
+ARTIFACT_MEMORY_ITEMS = int(os.environ.get("ARTIFACT_MEMORY_ITEMS", 64))
+
+
+class ArtifactStore:
+    """
+    Stores each artifact once on disk under the hash of its content, with a small
+    in-memory LRU for the artifacts rendered most recently. Session state only keeps keys.
+    """
+
+    def __init__(self, directory, memory_items):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def remember(self, key, value):
+        with self.lock:
+            self.memory[key] = value
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_items:
+                self.memory.popitem(last=False)
+
+    # Store bytes and return their key, writing only if the content is new
+    def put_bytes(self, data, suffix):
+        key = hashlib.sha256(data).hexdigest() + suffix
+        path = self.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return key
+
+    def put_text(self, text, suffix=".html"):
+        key = self.put_bytes(text.encode("utf-8"), suffix)
+        self.remember(key, text)
+        return key
+
+    def put_frame(self, df):
+        key = self.put_bytes(df.to_json(orient="split", date_format="iso").encode("utf-8"), ".frame.json")
+        self.remember(key, df)
+        return key
+
+    # Load an artifact by key, as text or as a DataFrame depending on how it was stored
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+        try:
+            with open(self.path(key), encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            logger.error(f"Artifact {key} not found")
+            return None
+        value = pd.read_json(io.StringIO(text), orient="split", dtype=False) if key.endswith(".frame.json") else text
+        self.remember(key, value)
+        return value
+
+    # Store a prepared chart (html, table, csv) and return the keys to keep in session state
+    def put_chart(self, chart):
+        html, table, csv = chart
+        return {"html": self.put_text(html), "table": self.put_frame(table), "csv": self.put_text(csv, ".csv")}
@@ -0,0 +1,238 @@
+"""
+Benchmark of the PowerBI tools against the local stand-in (powerbi_standin.py).
+
+Measures dax_query, dax_queries and powerbi_metadata throughput, latency
+percentiles and round trips, including token refreshes after 401s and injected
+server errors. Results can be saved as JSON and compared against a baseline,
+so caching, pooling and batching changes can be checked in CI.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --queries 200 --concurrency 16 --latency 0.1 --output results.json
+    python benchmark.py --baseline results.json --tolerance 0.25
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from powerbi_standin import PowerBIStandin
+
+# Helper function to point powerbilocal at the stand-in, before it is imported
+def configure_environment(url, cache_dir):
+    os.environ.update({
+        "POWERBI_LOGIN_URL": url,
+        "POWERBI_API_URL": f"{url}/v1.0/myorg",
+        "STORAGE_EMULATOR_HOST": url,
+        "GOOGLE_CLOUD_PROJECT": "standin",
+        "TENANT_ID": "standin",
+        "CLIENT_ID": "standin",
+        "CLIENT_SECRET": "standin",
+        "DATASET_ID": "benchmark",
+        "TMDL_BUCKET": "standin",
+        "TMDL_CACHE_DIR": cache_dir,
+    })
+
+# Helper function to get a percentile of a list of latencies
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+# Helper function to time calls, optionally on several threads
+def run_calls(fn, args, concurrency=1):
+    def timed(arg):
+        t = time.perf_counter()
+        result = fn(arg)
+        return time.perf_counter() - t, result
+
+    t = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(timed, args))
+    else:
+        outcomes = [timed(arg) for arg in args]
+    return time.perf_counter() - t, outcomes
+
+
+class Benchmark:
+    """
+    Runs each scenario against a fresh stand-in configuration and collects the results.
+    """
+
+    def __init__(self, standin, powerbilocal, args):
+        self.standin = standin
+        self.pb = powerbilocal
+        self.args = args
+        self.results = {}
+
+    # Clear every client-side cache and reset the stand-in
+    def reset(self, **config):
+        self.pb.dax_cache.entries.clear()
+        self.pb.dax_cache.refresh_checked = 0.0
+        self.pb.dax_cache.stats.update({"hits": 0, "misses": 0, "saved_seconds": 0.0})
+        self.pb.token_manager.token = None
+        with self.pb.metadata_lock:
+            self.pb.metadata_cache.update({"checked": 0.0, "files": {}, "generations": {}})
+        self.standin.configure(**{**self.base_config(), **config})
+        self.standin.reset_stats()
+
+    def base_config(self):
+        return {
+            "latency": self.args.latency,
+            "jitter": self.args.jitter,
+            "rows": self.args.rows,
+            "unauthorized_every": 0,
+            "error_rate": 0.0,
+            "seed": 0,
+        }
+
+    # Unique queries, so they are not served from the DAX cache
+    def queries(self, name, count):
+        return [f'EVALUATE FILTER(Sales, Sales[Region] <> "{name}-{i}")' for i in range(count)]
+
+    def record(self, name, elapsed, latencies, calls, errors, expected_errors=False, **extra):
+        stats = self.standin.snapshot()
+        self.results[name] = {
+            "calls": calls,
+            "errors": errors,
+            "expected_errors": expected_errors,
+            "elapsed_seconds": round(elapsed, 4),
+            "throughput_per_second": round(calls / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+            "server": stats,
+            **extra,
+        }
+
+    # Helper function to benchmark single dax_query calls
+    def dax_query_scenario(self, name, queries, concurrency=1, expected_errors=False, **config):
+        self.reset(**config)
+        self.pb.token_manager.get()
+        elapsed, outcomes = run_calls(self.pb.dax_query, queries, concurrency)
+        latencies = [latency for latency, _ in outcomes]
+        errors = sum(1 for _, result in outcomes if result.get("status") != "success")
+        self.record(name, elapsed, latencies, len(queries), errors, expected_errors,
+                    concurrency=concurrency, cache=dict(self.pb.dax_cache.stats))
+
+    def dax_queries_scenario(self, name, queries, batch):
+        self.reset()
+        self.pb.token_manager.get()
+        batches = [queries[i:i + batch] for i in range(0, len(queries), batch)]
+        elapsed, outcomes = run_calls(self.pb.dax_queries, batches)
+        latencies = [latency for latency, _ in outcomes]
+        errors = sum(1 for _, result in outcomes for r in result.get("results", []) if r["status"] != "success")
+        self.record(name, elapsed, latencies, len(batches), errors, batch_size=batch, queries=len(queries))
+
+    def metadata_scenario(self):
+        # Cold: empty memory and disk cache, every blob is downloaded
+        self.reset()
+        shutil.rmtree(self.pb.TMDL_CACHE_DIR, ignore_errors=True)
+        elapsed, outcomes = run_calls(lambda _: self.pb.powerbi_metadata(), [None])
+        self.record("powerbi_metadata_cold", elapsed, [elapsed], 1,
+                    sum(1 for _, r in outcomes if r.get("status") != "success"))
+
+        # Warm: served from memory within the revalidation window
+        self.standin.reset_stats()
+        elapsed, outcomes = run_calls(lambda _: self.pb.powerbi_metadata(), range(self.args.metadata_calls))
+        self.record("powerbi_metadata_warm", elapsed, [latency for latency, _ in outcomes], len(outcomes),
+                    sum(1 for _, r in outcomes if r.get("status") != "success"))
+
+        # Restart: empty memory, unchanged blobs are read back from disk after one listing
+        self.standin.reset_stats()
+        with self.pb.metadata_lock:
+            self.pb.metadata_cache.update({"checked": 0.0, "files": {}, "generations": {}})
+        elapsed, outcomes = run_calls(lambda _: self.pb.powerbi_metadata(), [None])
+        # Any download means the disk cache was not used, which counts as an error
+        self.record("powerbi_metadata_disk", elapsed, [elapsed], 1,
+                    sum(1 for _, r in outcomes if r.get("status") != "success") + self.standin.snapshot()["blob_downloads"])
+
+    def run(self):
+        n = self.args.queries
+        self.dax_query_scenario("dax_query_sequential", self.queries("seq", n))
+        self.dax_query_scenario("dax_query_cached", [self.queries("cached", 1)[0]] * n)
+        self.dax_query_scenario("dax_query_concurrent", self.queries("conc", n), concurrency=self.args.concurrency)
+        self.dax_query_scenario("dax_query_token_refresh", self.queries("token", n),
+                                unauthorized_every=self.args.unauthorized_every)
+        self.dax_query_scenario("dax_query_server_errors", self.queries("errors", n), expected_errors=True,
+                                error_rate=self.args.error_rate)
+        self.dax_queries_scenario("dax_queries_batched", self.queries("batch", n), self.args.batch)
+        self.metadata_scenario()
+        return self.results
+
+
+# Helper function to find scenarios that got slower than the baseline
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("throughput_per_second"):
+            continue
+        if result["throughput_per_second"] < base["throughput_per_second"] * (1 - tolerance):
+            found.append(f"{name}: {result['throughput_per_second']}/s vs baseline {base['throughput_per_second']}/s")
+    return found
+
+def print_results(results):
+    print(f"{'scenario':<28}{'calls':>7}{'errors':>8}{'per sec':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+          f"{'requests':>10}{'tokens':>8}{'401s':>6}")
+    for name, r in results.items():
+        s = r["server"]
+        print(f"{name:<28}{r['calls']:>7}{r['errors']:>8}{r['throughput_per_second']:>10}{r['p50_ms']:>10}"
+              f"{r['p90_ms']:>10}{r['p99_ms']:>10}{s['query_requests']:>10}{s['token_requests']:>8}{s['unauthorized']:>6}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=10, help="Queries per dax_queries call")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated executeQueries latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--unauthorized-every", type=int, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--metadata-calls", type=int, default=50)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Fail if throughput dropped compared to this results file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    standin = PowerBIStandin()
+    url = standin.start()
+    cache_dir = tempfile.mkdtemp(prefix="tmdl_benchmark_")
+    configure_environment(url, cache_dir)
+
+    # Imported after the environment is set, since settings are read at import time
+    import powerbilocal
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        results = Benchmark(standin, powerbilocal, args).run()
+    finally:
+        standin.stop()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    failures = [f"{name}: {r['errors']} unexpected error(s)" for name, r in results.items()
+                if r["errors"] and not r["expected_errors"]]
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures += regressions(results, json.load(f), args.tolerance)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Offline optimization of the PowerBI AnalyticalAgent.
+
+Bootstraps few-shot demos from a small labelled set so the compiled ReAct program
+reaches the right DAX query in fewer iterations, reports iterations before and after,
+and saves the compiled state for DSPyAgentApp.set_up to load. An example passes when
+the DAX queries that ran successfully reference every labelled table, column or measure.
+
+Usage:
+    python compile_agent.py --trainset trainset.json
+    python compile_agent.py --dummy    # offline smoke test with a dummy LM and the local stand-in
+"""
+
+import os
+import re
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import dspy
+from dspy.utils import DummyLM
+from agent import AnalyticalAgent
+
+MAX_ITERATIONS = 4
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Load labelled examples: [{"query": ..., "dax": ["Table[Column]", "[Measure]|Table[Column]", ...]}]
+# Each "dax" entry must appear in a successful query, "|" separates accepted alternatives
+def load_examples(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [dspy.Example(query=e["query"], dax=e["dax"]).with_inputs("query") for e in data]
+
+# Helper function to compare DAX references regardless of quoting, spacing and case
+def normalize_dax(text):
+    return re.sub(r"[\s']", "", text).lower()
+
+# Number of ReAct tool iterations in a prediction
+def iterations(pred):
+    return sum(1 for key in (getattr(pred, "trajectory", None) or {}) if key.startswith("tool_name_"))
+
+# DAX queries in a prediction that ran successfully
+def successful_queries(pred):
+    trajectory = getattr(pred, "trajectory", None) or {}
+    queries = []
+    for key, name in trajectory.items():
+        if not key.startswith("tool_name_"):
+            continue
+        args = trajectory.get(key.replace("tool_name_", "tool_args_"), {})
+        observation = trajectory.get(key.replace("tool_name_", "observation_"))
+        if not isinstance(observation, dict):
+            continue
+        if name == "dax_query" and observation.get("status") == "success":
+            queries.append(args.get("query", ""))
+        elif name == "dax_queries":
+            sent = args.get("queries", [])
+            queries += [sent[r["index"]] for r in observation.get("results", [])
+                        if r.get("status") == "success" and r.get("index", len(sent)) < len(sent)]
+    return queries
+
+# Fraction of labelled references used by the successful queries, strict pass/fail while bootstrapping demos
+def metric(example, pred, trace=None):
+    dax = normalize_dax(" ".join(successful_queries(pred)))
+    score = sum(any(normalize_dax(ref) in dax for ref in refs.split("|")) for refs in example.dax) / len(example.dax)
+    if trace is not None:
+        return score == 1.0 and iterations(pred) <= MAX_ITERATIONS
+    return score
+
+# Average score and iterations of a program over a dataset, failed examples score 0
+def evaluate(program, dataset):
+    result = dspy.Evaluate(devset=dataset, metric=metric, num_threads=1)(program)
+    return result.score / 100, statistics.mean(iterations(pred) for _, pred, _ in result.results)
+
+# Scripted LM that queries the labelled references and finishes, for the examples in the order they are run
+def dummy_lm(examples):
+    answers = []
+    for example in examples:
+        refs = [refs.split("|")[0] for refs in example.dax]
+        query = "EVALUATE SUMMARIZECOLUMNS(" + ", ".join(refs) + ")"
+        answers.append({"next_thought": "Query the data.", "next_tool_name": "dax_query", "next_tool_args": {"query": query}})
+        answers.append({"next_thought": "I have enough information.", "next_tool_name": "finish", "next_tool_args": {}})
+        answers.append({"reasoning": "Summarize.", "text_result": "Done.", "charts": ""})
+    return DummyLM(answers)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trainset", default=os.path.join(BASE_DIR, "trainset.json"))
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--dummy", action="store_true", help="Use a dummy LM and the local PowerBI stand-in")
+    parser.add_argument("--max-demos", type=int, default=4)
+    args = parser.parse_args()
+
+    # Hold out part of the set for the before/after report when there is enough data
+    examples = load_examples(args.trainset)
+    split = len(examples) // 2 if len(examples) >= 4 else len(examples)
+    trainset, devset = examples[:split], (examples[split:] or examples)
+
+    standin, cache_dir = None, None
+    if args.dummy:
+        from powerbi_standin import PowerBIStandin
+        from benchmark import configure_environment
+        standin = PowerBIStandin()
+        cache_dir = tempfile.mkdtemp(prefix="tmdl_compile_")
+        configure_environment(standin.start(), cache_dir)
+        # Evaluated before, bootstrapped, then evaluated after
+        lm = dummy_lm(devset + trainset + devset)
+        output = args.output or os.path.join(BASE_DIR, "compiled", "dummy_analytical_agent.json")
+    else:
+        import vertexai
+        vertexai.init(project=os.environ.get("GOOGLE_CLOUD_PROJECT"), location=os.environ.get("GOOGLE_CLOUD_LOCATION"))
+        lm = dspy.LM("vertexai/gemini-2.5-flash")
+        output = args.output or os.path.join(BASE_DIR, "compiled", "analytical_agent.json")
+    dspy.settings.configure(lm=lm)
+
+    # Imported after the environment is set, since settings are read at import time.
+    # Same tools as the chatbot, so the compiled instructions match at load time
+    from powerbilocal import dax_query, dax_queries, dax_result, powerbi_metadata, powerbi_schema
+    tools = [dax_query, dax_queries, dax_result, powerbi_schema, powerbi_metadata]
+
+    try:
+        before = evaluate(AnalyticalAgent(tools=tools), devset)
+        optimizer = dspy.BootstrapFewShot(metric=metric, max_bootstrapped_demos=args.max_demos, max_labeled_demos=0)
+        compiled = optimizer.compile(AnalyticalAgent(tools=tools), trainset=trainset)
+        after = evaluate(compiled, devset)
+    finally:
+        if standin is not None:
+            standin.stop()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # One extract call after the ReAct loop
+    for label, (score, iters) in (("Before:", before), ("After: ", after)):
+        print(f"{label} score {score:.2f}, {iters:.2f} iterations, {iters + 1:.2f} LM calls per question")
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    compiled.save(output)
+    print(f"Saved compiled agent to {output}")
+
+if __name__ == "__main__":
+    main()
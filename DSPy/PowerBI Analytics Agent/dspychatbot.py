@@ -4,65 +4,156 @@ import streamlit as st
 from dotenv import load_dotenv
 import time
 from helpersv2 import *
+from tracking import to_events
+from artifacts import ArtifactStore, ARTIFACT_DIR, ARTIFACT_MEMORY_ITEMS
 from agent import DSPyAgentApp
-from powerbilocal import dax_query, powerbi_metadata
+from powerbilocal import dax_cache, dax_query, dax_queries, dax_result, powerbi_metadata, powerbi_schema
 
 load_dotenv(override=True)
-# Setting up Vertex Agent
+
+# Chat history settings: turns rendered in full, collapsed turns listed per page, events listed in the logger
+CHAT_RECENT_TURNS = max(1, int(os.environ.get("CHAT_RECENT_TURNS", 3)))
+CHAT_HISTORY_PAGE = int(os.environ.get("CHAT_HISTORY_PAGE", 20))
+EVENT_LOG_SIZE = int(os.environ.get("EVENT_LOG_SIZE", 50))
+
+# Setting up one agent shared by every browser session
+@st.cache_resource
+def get_agent():
+    agent = DSPyAgentApp(
+        name="dspy_agent",
+        tools=[dax_query, dax_queries, dax_result, powerbi_schema, powerbi_metadata],
+        project=os.environ.get("GOOGLE_CLOUD_PROJECT"),
+        location=os.environ.get("GOOGLE_CLOUD_LOCATION"),
+        max_workers=int(os.environ.get("AGENT_MAX_WORKERS", 8)),
+    )
+    agent.set_up()
+    return agent
+
+# Chart artifacts shared by every browser session, session state only keeps their keys
+@st.cache_resource
+def get_artifacts():
+    return ArtifactStore(ARTIFACT_DIR, ARTIFACT_MEMORY_ITEMS)
+
 # Persistent data
 if "sessions" not in st.session_state:
     st.session_state.sessions = {0: {"name":f"New Session",
                                  "messages":[],
                                  "events": []}}
-    st.session_state.agent = DSPyAgentApp(
-        name="dspy_agent",
-        tools=[dax_query, powerbi_metadata],
-        project=os.environ.get("GOOGLE_CLOUD_PROJECT"),
-        location=os.environ.get("GOOGLE_CLOUD_LOCATION"),
-    )
-    st.session_state.agent.set_up()
+    # Per-session LM settings, e.g. {"temperature": 0.2}
+    st.session_state.lm_settings = {}
 if "current_session" not in st.session_state:
     st.session_state.current_session = 0
 
 # ---- Helper Functions for Chatbot Application ----
 def query_bot(message):
-    response = st.session_state.agent.query(message)
+    response = get_agent().submit(message, **st.session_state.lm_settings).result()
     print("Response:" + str(response))
-    gs = []
-    f = json.loads(response['charts']) if response['charts'] != '' else {}
-    for g in f:
-        print(g)
-        gs.append((create_graph(f[g]), extract_table_from_graph(f[g])))
-    return response['text'], gs
+    try:
+        f = json.loads(response['charts']) if response['charts'] != '' else {}
+    except json.JSONDecodeError as e:
+        return chart_notes(response['text'], [f"Charts could not be read: {e}"]), [], response['usage']
+    # A chart that cannot be built, e.g. from an evicted result handle, is skipped without losing the answer
+    gs, notes = prepare_charts(f, lambda graph: get_artifacts().put_chart(prepare_chart(graph)))
+    return chart_notes(response['text'], notes), gs, response['usage']
 
 # Clear current chat without deleting session
 def clear_chat():
-    st.session_state.sessions[st.session_state.current_session]["messages"] = []
+    session = st.session_state.sessions[st.session_state.current_session]
+    session["messages"] = []
+    session["expanded"] = set()
+    session["history_shown"] = CHAT_HISTORY_PAGE
+
+# Display graphs with their tables and a full resolution download, loaded from the artifact store
+def display_graphs(graphs, key):
+    artifacts = get_artifacts()
+    for idx, graph in enumerate(graphs):
+        # Display graph as html
+        st.components.v1.html(artifacts.get(graph["html"]), height=500)
+        st.dataframe(artifacts.get(graph["table"]))
+        st.download_button("⬇️ Download data", artifacts.get(graph["csv"]), file_name=f"chart_{key}_{idx}.csv",
+                           mime="text/csv", key=f"download_{key}_{idx}")
 
-# Function to display chat history with graphs
+# Group messages into turns of a user message and the answers that follow it
+def group_turns(messages):
+    turns = []
+    for msg_idx, msg in enumerate(messages):
+        if msg["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append((msg_idx, msg))
+    return turns
+
+# Display a single message in full
+def display_message(msg_idx, msg):
+    # Display user message
+    if msg["role"] == "user":
+        with st.chat_message("user"):
+            st.write(msg["content"])
+    # Display bot response
+    elif msg["role"] == "assistant":
+        with st.chat_message("assistant"):
+            # Time and cost info
+            st.markdown(f"""
+              <div style="display: flex; justify-content: flex-start; font-size: 12px; color: gray; margin-bottom: 10px;">
+                  <span style="margin-right: 2em;">Time elapsed: {msg["time"]:.2f}s</span>
+                  <span style="margin-right: 2em;">Cost accrued: {msg["cost"]:.4f}</span>
+                  <span>{msg.get("usage", {}).get("lm_calls", 0)} LM / {msg.get("usage", {}).get("tool_calls", 0)} tool calls</span>
+              </div> """, unsafe_allow_html=True)
+            # Textual Response
+            st.write(msg["content"])
+            if msg["graphs"]:
+                display_graphs(msg["graphs"], f"{st.session_state.current_session}_{msg_idx}")
+
+# Display an older turn as a one-line placeholder, rendering it only once expanded
+def display_collapsed_turn(session, turn):
+    key = turn[0][0]
+    if key in session["expanded"]:
+        if st.button("🔼 Collapse", key=f"collapse_{st.session_state.current_session}_{key}", type='tertiary'):
+            session["expanded"].discard(key)
+            st.rerun()
+        for msg_idx, msg in turn:
+            display_message(msg_idx, msg)
+        return
+    prompt = next((msg["content"] for _, msg in turn if msg["role"] == "user"), "")
+    charts = sum(len(msg.get("graphs") or []) for _, msg in turn)
+    label = prompt if len(prompt) <= 80 else prompt[:80] + "…"
+    if st.button(f"💬 {label}" + (f" · 📊 {charts}" if charts else ""),
+                 key=f"expand_{st.session_state.current_session}_{key}", type='tertiary'):
+        session["expanded"].add(key)
+        st.rerun()
+
+# Function to display chat history, with only the latest turns rendered in full
 def display_chat_history():
     st.title("🧠 Chat with Analytics Agent")
-    for msg in st.session_state.sessions[st.session_state.current_session]["messages"]:
-        # Display user message
-        if msg["role"] == "user":
-            with st.chat_message("user"):
-                st.write(msg["content"])
-        # Display bot response
-        elif msg["role"] == "assistant":
-            with st.chat_message("assistant"):
-                # Time and cost info
-                st.markdown(f"""
-                  <div style="display: flex; justify-content: flex-start; font-size: 12px; color: gray; margin-bottom: 10px;">
-                      <span style="margin-right: 2em;">Time elapsed: {msg["time"]:.2f}s</span>
-                      <span>Cost accrued: {msg["cost"]:.4f}</span>
-                  </div> """, unsafe_allow_html=True)
-                # Textual Response
-                st.write(msg["content"])
-                if msg["graphs"]:
-                    for graph, table in msg.get("graphs", []):
-                        # Display graph as html
-                        st.components.v1.html(graph, height=500)
-                        st.dataframe(table)
+    session = st.session_state.sessions[st.session_state.current_session]
+    session.setdefault("expanded", set())
+    session.setdefault("history_shown", CHAT_HISTORY_PAGE)
+    turns = group_turns(session["messages"])
+    older, recent = turns[:-CHAT_RECENT_TURNS], turns[-CHAT_RECENT_TURNS:]
+
+    # Older turns as placeholders, one page at a time
+    hidden = len(older) - session["history_shown"]
+    if hidden > 0:
+        if st.button(f"⏫ Show {min(hidden, CHAT_HISTORY_PAGE)} earlier turns ({hidden} hidden)", type='tertiary'):
+            session["history_shown"] += CHAT_HISTORY_PAGE
+            st.rerun()
+    for turn in older[max(hidden, 0):]:
+        display_collapsed_turn(session, turn)
+
+    for turn in recent:
+        for msg_idx, msg in turn:
+            display_message(msg_idx, msg)
+
+# Short label of an event for the Event Logger
+def event_label(event):
+    part = event['content']['parts'][0]
+    if 'function_call' in part:
+        return part.get('function_call').get('name', 'N/A')
+    # Check if the event contains a function response
+    if 'function_response' in part:
+        return part.get('function_response').get('name', 'N/A')
+    # For textual events
+    text_output = part.get('text') or ''
+    return text_output[:30] if len(text_output) > 30 else text_output
 
 # Sidebar module for session manager
 def sidebar():
@@ -77,6 +168,11 @@ def sidebar():
                     """)
         if st.button("♻️ Clear Chat", key="top_clear", type='primary'):
             clear_chat()
+        # Per-call usage of every answer in this session
+        calls = [dict(call, message=idx) for idx, msg in enumerate(st.session_state.sessions[st.session_state.current_session]["messages"])
+                 for call in msg.get("usage", {}).get("calls", [])]
+        st.download_button("📤 Export Usage", json.dumps(calls, indent=2, default=str), file_name="usage.json",
+                           mime="application/json", key="export_usage")
 
     st.sidebar.markdown("### 🗒️ Session List")
     # Rename current session
@@ -96,24 +192,27 @@ def sidebar():
     st.sidebar.markdown(f""":red[**Click session name to switch.**]""")
     st.sidebar.markdown("---")
 
-    # Log agent events
+    # DAX result cache counters, shared by every session
+    with st.sidebar.expander("⚡ DAX Cache", expanded=False):
+        stats = dax_cache.stats
+        total = stats["hits"] + stats["misses"]
+        st.markdown(f""":gray[**Hits:**] *{stats["hits"]}*  
+                    :gray[**Misses:**] *{stats["misses"]}*  
+                    :gray[**Hit Rate:**] *{(stats["hits"] / total if total else 0):.0%}*  
+                    :green[**Time Saved:**] *{stats["saved_seconds"]:.2f}s*
+                    """)
+
+    # Log agent events, listing the latest ones and showing the details of one at a time
     with st.sidebar.expander("📝 Event Logger", expanded=True):
         events = st.session_state.sessions[st.session_state.current_session]["events"]
         if events:
-            for idx, event in enumerate(events):
-                # Log events based on their type
-                if 'function_call' in event['content']['parts'][0]:
-                    with st.expander(f"**{idx}**: {event['content']['parts'][0].get('function_call').get('name', 'N/A')}"):
-                        st.json(event)
-                # Check if the event contains a function response
-                elif 'function_response' in event['content']['parts'][0]:
-                    with st.expander(f"**{idx}**: {event['content']['parts'][0].get('function_response').get('name', 'N/A')}"):
-                        st.json(event)
-                # For textual events
-                elif 'text' in event['content']['parts'][0]:
-                    text_output = event['content']['parts'][0].get('text')
-                    with st.expander(f"**{idx}**: {text_output[:30] if len(text_output) > 30 else text_output}"):
-                        st.json(event)
+            start = max(0, len(events) - EVENT_LOG_SIZE)
+            if start:
+                st.caption(f"Showing the last {EVENT_LOG_SIZE} of {len(events)} events")
+            idx = st.selectbox("Event", range(len(events) - 1, start - 1, -1),
+                               format_func=lambda i: f"{i}: {event_label(events[i])}",
+                               key=f"event_{st.session_state.current_session}")
+            st.json(events[idx], expanded=False)
         else:
             st.markdown(f":blue[***Logged Session Events Appear Here***]")
 
@@ -134,19 +233,22 @@ if prompt:
     with st.chat_message("assistant"):
         t = time.time()
         with st.spinner("Thinking...", show_time=True):
-            text, graphs = query_bot(prompt)
+            text, graphs, usage = query_bot(prompt)
             tt = time.time() - t
+            session = st.session_state.sessions[st.session_state.current_session]
+            session["cost"] = session.get("cost", 0) + usage["cost"]
+            session["events"].extend(to_events(usage["calls"]))
             # Extract response and add to chat history
             st.markdown(f"""
               <div style="display: flex; justify-content: flex-start; font-size: 12px; color: gray; margin-bottom: 10px;">
                   <span style="margin-right: 2em;">Time elapsed: {tt:.2f}s</span>
-                  <span>Cost accrued: {1}</span>
+                  <span style="margin-right: 2em;">Cost accrued: {usage["cost"]:.4f}</span>
+                  <span>{usage["lm_calls"]} LM / {usage["tool_calls"]} tool calls</span>
               </div> """, unsafe_allow_html=True)
             st.write(text)
             if graphs:
-                for graph, table in graphs:
-                    # Display graph as html
-                    st.components.v1.html(graph, height=500)
-                    st.dataframe(table)
+                messages = st.session_state.sessions[st.session_state.current_session]["messages"]
+                display_graphs(graphs, f"{st.session_state.current_session}_{len(messages)}")
             st.session_state.sessions[st.session_state.current_session]["messages"].append({"role": "assistant",
-                                                                                            "content": text, "graphs": graphs, "cost": 1, "time": tt})
+                                                                                            "content": text, "graphs": graphs, "cost": usage["cost"], "time": tt,
+                                                                                            "usage": usage})
@@ -1,5 +1,12 @@
+import os
 import json
+import numpy as np
 import pandas as pd
+from powerbilocal import get_result
+
+# Chart payload limits
+MAX_CHART_POINTS = int(os.environ.get("MAX_CHART_POINTS", 1000))
+MAX_CHART_BYTES = int(os.environ.get("MAX_CHART_BYTES", 200_000))
 
 # Split a chatbot response into text and graphs
 def split_response(response):
@@ -12,11 +19,8 @@ def split_response(response):
         try:
             # Load the JSON data
             data = json.loads(json_data)
-            graphs = []
-            for graph in data["charts"]:
-                # Create graph based on the data
-                graphs.append((create_graph(data["charts"][graph]), extract_table_from_graph(data["charts"][graph])))
-            return text, graphs
+            graphs, notes = prepare_charts(data["charts"])
+            return chart_notes(text, notes), graphs
         except json.JSONDecodeError:
             return text, None
     else:
@@ -47,13 +51,145 @@ def format_number(num):
     else:
         return f"{num:.0f}"
 
-def extract_table_from_graph(graph):
+# Vectorized version of format_number for a whole DataFrame
+def format_numbers(df):
+    values = df.apply(pd.to_numeric, errors="coerce")
+    abs_values = values.abs()
+    millions = (values / 1_000_000).round(1).astype(str) + "M"
+    thousands = (values / 1_000).round(0).astype("Int64").astype(str) + "K"
+    units = values.round(0).astype("Int64").astype(str)
+    formatted = units.where(abs_values < 1_000, thousands.where(abs_values < 1_000_000, millions))
+    return formatted.where(values.notna(), "-")
+
+# Build the Highcharts config of a chart that references a stored query result by handle,
+# e.g. {"handle": "...", "type": "line", "x": "Month", "y": ["Sales"], "title": {...}}
+def resolve_chart(graph):
+    if "handle" not in graph:
+        return graph
+    df = get_result(graph["handle"])
+    if df is None:
+        raise ValueError(f"the result {graph['handle']} is no longer stored, run the query again")
+    x = graph.get("x") or df.columns[0]
+    ys = graph.get("y") or [col for col in df.columns if col != x and pd.api.types.is_numeric_dtype(df[col])]
+    ys = [ys] if isinstance(ys, str) else ys
+    missing = [col for col in [x, *ys] if col not in df.columns]
+    if missing:
+        raise ValueError(f"the result {graph['handle']} has no column(s) {', '.join(map(str, missing))}")
+    chart = {key: value for key, value in graph.items() if key not in ("handle", "x", "y", "type")}
+    chart["chart"] = {"type": graph.get("type", "line"), **chart.get("chart", {})}
+    chart["xAxis"] = {"title": {"text": x}, **chart.get("xAxis", {}), "categories": df[x].astype(str).tolist()}
+    chart["series"] = [
+        {"name": y, "data": [None if pd.isna(v) else float(v) for v in pd.to_numeric(df[y], errors="coerce")]}
+        for y in ys
+    ]
+    return chart
+
+def extract_table_from_graph(graph, formatted=True):
+    graph = resolve_chart(graph)
     categories = graph.get("xAxis", {}).get("categories", [])
-    data_dict = {}
-    for series in graph.get("series", []):
-        data_dict[series["name"]] = series.get("data", [])
-    df = pd.DataFrame(data_dict, index=categories).map(format_number)
+    if categories:
+        data_dict = {}
+        for series in graph.get("series", []):
+            data_dict[series["name"]] = [point_xy(point, i)[1] for i, point in enumerate(series.get("data", []))]
+        df = pd.DataFrame(data_dict, index=categories)
+    else:
+        # Points carry their own x values, e.g. timestamps, so index by x and align the series on it
+        columns = []
+        for series in graph.get("series", []):
+            points = [point_xy(point, i) for i, point in enumerate(series.get("data", []))]
+            column = pd.Series([y for _, y in points], index=[x for x, _ in points], name=series["name"])
+            columns.append(column[~column.index.duplicated(keep="last")])
+        df = pd.concat(columns, axis=1, join="outer").sort_index() if columns else pd.DataFrame()
+        if graph.get("xAxis", {}).get("type") == "datetime" and pd.api.types.is_numeric_dtype(df.index):
+            # Highcharts datetime axes use milliseconds since the epoch
+            df.index = pd.to_datetime(df.index, unit="ms")
+    if formatted:
+        df = format_numbers(df)
     df.index.name = graph.get("xAxis", {}).get("title", {}).get("text", "Category")
 
     return df
 
+# Get the x and y value of a Highcharts point, which may be a number, [x, y] or {"x", "y"}
+def point_xy(point, index):
+    if isinstance(point, dict):
+        return point.get("x", index), point.get("y")
+    if isinstance(point, (list, tuple)):
+        return (point[0], point[1]) if len(point) > 1 else (index, point[0])
+    return index, point
+
+# Largest-Triangle-Three-Buckets, returns the indexes of the points to keep
+def lttb(x, y, threshold):
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    every = (n - 2) / (threshold - 2)
+    indexes = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        next_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indexes.append(a)
+    indexes.append(n - 1)
+    return np.asarray(indexes)
+
+# Downsample long series so the chart keeps its shape with at most max_points per series
+def downsample_graph(graph, max_points=MAX_CHART_POINTS):
+    graph = json.loads(json.dumps(graph))
+    series_list = graph.get("series", [])
+    categories = graph.get("xAxis", {}).get("categories")
+    if categories and len(categories) > max_points:
+        # Series share categories, so keep the union of points picked for each series
+        per_series = max(3, max_points // max(len(series_list), 1))
+        keep = set()
+        for series in series_list:
+            ys = [point_xy(point, i)[1] for i, point in enumerate(series.get("data", []))]
+            keep.update(lttb(np.arange(len(ys)), [np.nan if v is None else v for v in ys], per_series).tolist())
+        keep = sorted(i for i in keep if i < len(categories))
+        graph["xAxis"]["categories"] = [categories[i] for i in keep]
+        for series in series_list:
+            data = series.get("data", [])
+            series["data"] = [data[i] for i in keep if i < len(data)]
+    elif not categories:
+        for series in series_list:
+            data = series.get("data", [])
+            if len(data) > max_points:
+                points = [point_xy(point, i) for i, point in enumerate(data)]
+                try:
+                    xs = [float(p[0]) for p in points]
+                except (TypeError, ValueError):
+                    xs = list(range(len(points)))
+                ys = [np.nan if p[1] is None else p[1] for p in points]
+                series["data"] = [data[i] for i in lttb(xs, ys, max_points)]
+    return graph
+
+# Build the chart html from a downsampled copy under the payload cap, and the tables from the full data
+def prepare_chart(graph):
+    graph = resolve_chart(graph)
+    max_points = MAX_CHART_POINTS
+    html = create_graph(downsample_graph(graph, max_points))
+    while len(html) > MAX_CHART_BYTES and max_points > 50:
+        max_points //= 2
+        html = create_graph(downsample_graph(graph, max_points))
+    full = extract_table_from_graph(graph, formatted=False)
+    return html, format_numbers(full), full.to_csv()
+
+# Prepare every chart of a response, skipping the ones that cannot be built with a note for each
+def prepare_charts(charts, prepare=prepare_chart):
+    graphs, notes = [], []
+    for name, graph in charts.items():
+        try:
+            graphs.append(prepare(graph))
+        except Exception as e:
+            notes.append(f"Chart '{name}' could not be displayed: {e}")
+    return graphs, notes
+
+# Helper function to add the notes about skipped charts to the response text
+def chart_notes(text, notes):
+    return "\n\n".join([text] + [f"_⚠️ {note}_" for note in notes]) if notes else text
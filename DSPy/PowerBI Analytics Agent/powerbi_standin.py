@@ -0,0 +1,340 @@
+"""
+Local stand-in for the PowerBI services used by powerbilocal.py.
+
+Implements the Azure AD token endpoint, executeQueries, the dataset refresh
+history and the small part of the Cloud Storage JSON API used to list and
+download TMDL metadata. Latency, row counts, token lifetime and failures
+(401s, 500s, the one-query-per-request limit) are configurable, so caching,
+pooling and batching changes can be measured without a live workspace.
+
+Point powerbilocal.py at it with:
+    POWERBI_LOGIN_URL=http://127.0.0.1:8765
+    POWERBI_API_URL=http://127.0.0.1:8765/v1.0/myorg
+    STORAGE_EMULATOR_HOST=http://127.0.0.1:8765
+
+Usage:
+    python powerbi_standin.py --port 8765 --latency 0.2 --rows 500 --unauthorized-every 50
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REGIONS = ["North", "South", "East", "West", "Central"]
+CATEGORIES = ["Apparel", "Electronics", "Grocery", "Home", "Toys", "Beauty", "Sports"]
+
+
+# Default behaviour of the stand-in, every value can be changed while it runs
+DEFAULT_CONFIG = {
+    "latency": 0.05,             # seconds added to every executeQueries request
+    "jitter": 0.0,               # extra uniform random latency, in seconds
+    "rows": 100,                 # rows per result, unless the query uses TOPN(n, ...)
+    "token_latency": 0.0,        # seconds added to every token request
+    "token_lifetime": 3600,      # expires_in of issued tokens
+    "unauthorized_every": 0,     # every Nth executeQueries request returns 401 and revokes its token
+    "error_rate": 0.0,           # fraction of executeQueries requests that fail with 500
+    "max_queries_per_request": 1,
+    "metadata_tables": 20,       # number of generated TMDL table files
+    "blob_latency": 0.0,         # seconds added to every blob download
+    "seed": 0,
+}
+
+
+# Helper function to build one TMDL table file
+def table_tmdl(name, columns):
+    lines = [f"table {name}"]
+    for column, data_type in columns:
+        lines += [f"\tcolumn {column}", f"\t\tdataType: {data_type}"]
+    return "\n".join(lines) + "\n"
+
+# Helper function to build the generated TMDL files of the stand-in semantic model
+def generate_metadata(table_count):
+    files = {
+        "tables/Sales.tmdl": table_tmdl("Sales", [("SalesKey", "int64"), ("DateKey", "int64"), ("StoreKey", "int64"),
+                                                  ("Region", "string"), ("Category", "string"), ("Amount", "double")]),
+        "tables/Date.tmdl": table_tmdl("Date", [("DateKey", "int64"), ("Date", "dateTime"), ("Year", "int64"), ("Month", "string")]),
+        "tables/Store.tmdl": table_tmdl("Store", [("StoreKey", "int64"), ("StoreName", "string"), ("Region", "string")]),
+        "measures/Measures.tmdl": "table Measures\n\tmeasure 'Total Sales' = SUM(Sales[Amount])\n\t\tformatString: #,0.00\n",
+    }
+    relationships = [("Sales.DateKey", "Date.DateKey"), ("Sales.StoreKey", "Store.StoreKey")]
+    for i in range(max(table_count - 3, 0)):
+        files[f"tables/Dim{i}.tmdl"] = table_tmdl(f"Dim{i}", [(f"Dim{i}Key", "int64"), (f"Dim{i}Name", "string")])
+        relationships.append(("Sales.SalesKey", f"Dim{i}.Dim{i}Key"))
+    files["relationships.tmdl"] = "".join(
+        f"relationship {uuid.UUID(int=i)}\n\tfromColumn: {src}\n\ttoColumn: {dst}\n\n"
+        for i, (src, dst) in enumerate(relationships)
+    )
+    return files
+
+# Helper function to generate deterministic rows for a query
+def generate_rows(query, default_rows):
+    match = re.search(r"TOPN\s*\(\s*(\d+)", query, re.IGNORECASE)
+    count = int(match.group(1)) if match else default_rows
+    return [
+        {
+            "Sales[Region]": REGIONS[i % len(REGIONS)],
+            "Sales[Category]": CATEGORIES[i % len(CATEGORIES)],
+            "Date[Year]": 2020 + i % 5,
+            "[Total Sales]": round(1000 + (i * 37 % 997) * 1.5, 2),
+        }
+        for i in range(count)
+    ]
+
+
+class PowerBIStandin:
+    """
+    In-process PowerBI and metadata bucket stand-in, served on a background thread.
+    Counts every request so benchmarks can report retries and round trips.
+    """
+
+    def __init__(self, **config):
+        unknown = set(config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown stand-in settings: {sorted(unknown)}")
+        self.config = {**DEFAULT_CONFIG, **config}
+        self.lock = threading.Lock()
+        self.random = random.Random(self.config["seed"])
+        self.tokens = {}
+        self.refresh_time = datetime.now(timezone.utc).isoformat()
+        self.blobs = {}
+        self.set_metadata(generate_metadata(self.config["metadata_tables"]))
+        self.reset_stats()
+        self.server = None
+        self.thread = None
+
+    # Replace the bucket contents, bumping the generation of every changed blob
+    def set_metadata(self, files):
+        with self.lock:
+            blobs = {}
+            for name, text in files.items():
+                old = self.blobs.get(name)
+                generation = old["generation"] if old and old["text"] == text else time.time_ns()
+                blobs[name] = {"text": text, "generation": generation}
+            self.blobs = blobs
+
+    # Simulate a dataset refresh, which invalidates cached DAX results
+    def refresh_dataset(self):
+        with self.lock:
+            self.refresh_time = datetime.now(timezone.utc).isoformat()
+
+    def configure(self, **config):
+        unknown = set(config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown stand-in settings: {sorted(unknown)}")
+        with self.lock:
+            self.config.update(config)
+            if "seed" in config:
+                self.random = random.Random(config["seed"])
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {
+                "token_requests": 0,
+                "query_requests": 0,
+                "queries": 0,
+                "unauthorized": 0,
+                "server_errors": 0,
+                "rejected": 0,
+                "refresh_requests": 0,
+                "list_requests": 0,
+                "blob_downloads": 0,
+            }
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    # Issue a new access token
+    def issue_token(self):
+        time.sleep(self.config["token_latency"])
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.stats["token_requests"] += 1
+            self.tokens[token] = time.time() + self.config["token_lifetime"]
+        return {"token_type": "Bearer", "expires_in": self.config["token_lifetime"], "access_token": token}
+
+    # Check a bearer token, returning False if it is unknown, revoked or expired
+    def authorized(self, header):
+        token = (header or "").removeprefix("Bearer ").strip()
+        with self.lock:
+            return self.tokens.get(token, 0) > time.time()
+
+    # Run an executeQueries request, returning the status code and body
+    def execute_queries(self, header, body):
+        with self.lock:
+            self.stats["query_requests"] += 1
+            request_number = self.stats["query_requests"]
+            config = dict(self.config)
+            fail = self.random.random() < config["error_rate"]
+            jitter = self.random.uniform(0, config["jitter"]) if config["jitter"] else 0.0
+
+        if not self.authorized(header):
+            self.count("unauthorized")
+            return 401, {"error": {"code": "TokenExpired", "message": "Access token has expired"}}
+        if config["unauthorized_every"] and request_number % config["unauthorized_every"] == 0:
+            # Revoke the token, as if it expired early
+            with self.lock:
+                self.tokens.pop((header or "").removeprefix("Bearer ").strip(), None)
+                self.stats["unauthorized"] += 1
+            return 401, {"error": {"code": "TokenExpired", "message": "Access token has expired"}}
+
+        queries = body.get("queries", [])
+        if not queries or len(queries) > config["max_queries_per_request"]:
+            self.count("rejected")
+            return 400, {"error": {"code": "BadRequest",
+                                   "message": f"Expected 1 to {config['max_queries_per_request']} queries per request"}}
+
+        time.sleep(config["latency"] + jitter)
+        if fail:
+            self.count("server_errors")
+            return 500, {"error": {"code": "InternalServerError", "message": "Injected failure"}}
+
+        self.count("queries", len(queries))
+        return 200, {"results": [{"tables": [{"rows": generate_rows(q.get("query", ""), config["rows"])}]} for q in queries]}
+
+    def refreshes(self, header):
+        self.count("refresh_requests")
+        if not self.authorized(header):
+            return 401, {"error": {"code": "TokenExpired", "message": "Access token has expired"}}
+        return 200, {"value": [{"status": "Completed", "startTime": self.refresh_time, "endTime": self.refresh_time}]}
+
+    # Cloud Storage object resource for a blob
+    def blob_resource(self, bucket, name):
+        blob = self.blobs[name]
+        return {
+            "kind": "storage#object",
+            "bucket": bucket,
+            "name": name,
+            "generation": str(blob["generation"]),
+            "metageneration": "1",
+            "size": str(len(blob["text"].encode("utf-8"))),
+            "contentType": "text/plain",
+        }
+
+    def list_blobs(self, bucket, prefix):
+        self.count("list_requests")
+        with self.lock:
+            names = sorted(name for name in self.blobs if name.startswith(prefix or ""))
+            return 200, {"kind": "storage#objects", "items": [self.blob_resource(bucket, name) for name in names]}
+
+    # Download a blob, with the generation headers the client library reads into blob.generation
+    def download_blob(self, name):
+        time.sleep(self.config["blob_latency"])
+        with self.lock:
+            blob = self.blobs.get(name)
+            if blob is None:
+                return 404, None, {}
+            self.stats["blob_downloads"] += 1
+            headers = {"X-Goog-Generation": str(blob["generation"]), "X-Goog-Metageneration": "1"}
+            return 200, blob["text"].encode("utf-8"), headers
+
+    def start(self, host="127.0.0.1", port=0):
+        """Serve on a background thread and return the base URL."""
+        self.server = ThreadingHTTPServer((host, port), make_handler(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return f"http://{host}:{self.server.server_address[1]}"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+# Helper function to build the request handler bound to a stand-in
+def make_handler(standin):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send(self, status, body, content_type="application/json", headers=None):
+            data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            raw = self.read_body()
+            if re.match(r"^/[^/]+/oauth2/v2\.0/token$", path):
+                return self.send(200, standin.issue_token())
+            if re.match(r"^/v1\.0/myorg/datasets/[^/]+/executeQueries$", path):
+                try:
+                    body = json.loads(raw or b"{}")
+                except json.JSONDecodeError:
+                    return self.send(400, {"error": {"code": "BadRequest", "message": "Invalid JSON"}})
+                return self.send(*standin.execute_queries(self.headers.get("Authorization"), body))
+            self.send(404, {"error": {"code": "NotFound", "message": path}})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if re.match(r"^/v1\.0/myorg/datasets/[^/]+/refreshes$", url.path):
+                return self.send(*standin.refreshes(self.headers.get("Authorization")))
+            if url.path == "/stats":
+                return self.send(200, standin.snapshot())
+
+            # Cloud Storage JSON API: object listing, media download and object metadata
+            listing = re.match(r"^/storage/v1/b/([^/]+)/o/?$", url.path)
+            if listing:
+                return self.send(*standin.list_blobs(listing.group(1), params.get("prefix", [""])[0]))
+            obj = re.match(r"^(?:/download)?/storage/v1/b/([^/]+)/o/(.+)$", url.path)
+            if obj:
+                name = unquote(obj.group(2))
+                if params.get("alt", [""])[0] == "media":
+                    status, data, headers = standin.download_blob(name)
+                    return self.send(status, data or b"", "text/plain", headers)
+                if name in standin.blobs:
+                    return self.send(200, standin.blob_resource(obj.group(1), name))
+                return self.send(404, {"error": {"code": 404, "message": f"No such object: {name}"}})
+            self.send(404, {"error": {"code": "NotFound", "message": url.path}})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for key, value in DEFAULT_CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = vars(parser.parse_args())
+    host, port = args.pop("host"), args.pop("port")
+
+    standin = PowerBIStandin(**args)
+    url = standin.start(host, port)
+    print(f"PowerBI stand-in listening on {url}")
+    print(f"  POWERBI_LOGIN_URL={url}")
+    print(f"  POWERBI_API_URL={url}/v1.0/myorg")
+    print(f"  STORAGE_EMULATOR_HOST={url}")
+    try:
+        standin.thread.join()
+    except KeyboardInterrupt:
+        standin.stop()
+
+if __name__ == "__main__":
+    main()
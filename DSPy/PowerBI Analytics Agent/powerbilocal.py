@@ -5,21 +5,60 @@ Tools for PowerBI queries.
 import os
 import time
 import logging
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import storage
 import json
+import re
+import uuid
+from collections import OrderedDict
+import pandas as pd
+from tmdl import SchemaIndex
 
 # Logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-access_token = None
+# PowerBI connection settings, the URLs can point at a local stand-in (see powerbi_standin.py)
+POWERBI_LOGIN_URL = os.environ.get("POWERBI_LOGIN_URL", "https://login.microsoftonline.com").rstrip("/")
+POWERBI_API_URL = os.environ.get("POWERBI_API_URL", "https://api.powerbi.com/v1.0/myorg").rstrip("/")
+POWERBI_POOL_SIZE = int(os.environ.get("POWERBI_POOL_SIZE", 16))
+TOKEN_REFRESH_MARGIN = float(os.environ.get("TOKEN_REFRESH_MARGIN", 300))
+# executeQueries currently accepts one query per request, raise this if the service allows more
+DAX_BATCH_SIZE = int(os.environ.get("DAX_BATCH_SIZE", 1))
+DAX_MAX_PARALLEL = int(os.environ.get("DAX_MAX_PARALLEL", 8))
+# DAX result cache settings
+DAX_CACHE_TTL = float(os.environ.get("DAX_CACHE_TTL", 3600))
+DAX_REFRESH_CHECK_SECONDS = float(os.environ.get("DAX_REFRESH_CHECK_SECONDS", 60))
+DAX_CACHE_MAX_ENTRIES = int(os.environ.get("DAX_CACHE_MAX_ENTRIES", 256))
+
+# Keep-alive HTTP session shared by every query
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=POWERBI_POOL_SIZE))
+http_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=POWERBI_POOL_SIZE))
+
+# TMDL metadata cache settings
+TMDL_BUCKET = os.environ.get("TMDL_BUCKET", "timesquare-retail")
+TMDL_CACHE_DIR = os.environ.get("TMDL_CACHE_DIR", ".tmdl_cache")
+TMDL_REVALIDATE_SECONDS = float(os.environ.get("TMDL_REVALIDATE_SECONDS", 60))
+TMDL_DOWNLOAD_WORKERS = int(os.environ.get("TMDL_DOWNLOAD_WORKERS", 8))
+
+metadata_lock = threading.Lock()
+metadata_cache = {"checked": 0.0, "files": {}, "generations": {}}
+storage_client = None
+
+# Schema pruning settings
+TMDL_SCHEMA_TOP_K = int(os.environ.get("TMDL_SCHEMA_TOP_K", 5))
+TMDL_EMBEDDING_MODEL = os.environ.get("TMDL_EMBEDDING_MODEL")
+schema_index = {"generations": None, "index": None}
 
 # Helper function to reconnect to PowerBI data source
 def reconnect():
     try:
         # Generate Authentication Token
-        url = f"https://login.microsoftonline.com/{os.environ.get('TENANT_ID')}/oauth2/v2.0/token"
+        url = f"{POWERBI_LOGIN_URL}/{os.environ.get('TENANT_ID')}/oauth2/v2.0/token"
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded',
         }
@@ -29,46 +68,336 @@ def reconnect():
             "client_secret": os.environ.get('CLIENT_SECRET'),
             "scope": "https://analysis.windows.net/powerbi/api/.default"
         }
-        print(url)
-        print(body)
-        response = requests.post(url, data=body, headers=headers)
+        response = http_session.post(url, data=body, headers=headers)
         response.raise_for_status()
 
-        # Return generated access token
-        return response.json()['access_token']
+        # Return generated access token and its lifetime in seconds
+        data = response.json()
+        return data['access_token'], float(data.get('expires_in', 3600))
     except Exception as e:
         logger.info(f"Error reconnecting to PowerBI: {str(e)}")
-        return None
+        return None, 0
+
+class TokenManager:
+    """
+    Thread-safe holder for the PowerBI access token, refreshed ahead of expiry
+    and shared by every session in the process.
+    """
 
-# Helper Function to execute a DAX query in a PowerBI data source
-def request_data(query, access_token):
+    def __init__(self, refresh_margin):
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.token = None
+        self.expires_at = 0.0
+        self.lifetime = 0.0
+
+    def get(self):
+        with self.lock:
+            # Refresh ahead of expiry, but never more than halfway through a short-lived token
+            margin = min(self.refresh_margin, self.lifetime / 2)
+            if not self.token or time.time() >= self.expires_at - margin:
+                logger.info("No valid access token found, retrieving new token...")
+                token, expires_in = reconnect()
+                if token:
+                    self.token = token
+                    self.expires_at = time.time() + expires_in
+                    self.lifetime = expires_in
+            return self.token
+
+    # Drop a token the service rejected, unless another thread already replaced it
+    def invalidate(self, token):
+        with self.lock:
+            if self.token == token:
+                self.token = None
+
+token_manager = TokenManager(TOKEN_REFRESH_MARGIN)
+
+# Helper Function to execute a batch of DAX queries in one executeQueries request
+def request_batch(queries, access_token):
     # Generate API url to execute query
-    url = f"https://api.powerbi.com/v1.0/myorg/datasets/{os.environ.get('DATASET_ID')}/executeQueries"
+    url = f"{POWERBI_API_URL}/datasets/{os.environ.get('DATASET_ID')}/executeQueries"
     headers = {
         'Content-Type': 'application/json',
         'Authorization': f'Bearer {access_token}'
     }
     body = {
-        "queries": [{"query": query}],
+        "queries": [{"query": query} for query in queries],
         "serializerSettings": {"includeNulls": True}
     }
 
     t = time.time()
     # Execute the query
-    response = requests.post(url, data=json.dumps(body), headers=headers)
+    response = http_session.post(url, data=json.dumps(body), headers=headers)
     try:
         response.raise_for_status()
     except requests.exceptions.HTTPError as http_err:
         logger.error(f"HTTP error occurred: {http_err} - Response: {response.text}")
+        raise
+
+    # Return the usable results, in the same order as the queries
+    logger.info(f"DAX Query Time: {time.time() - t:.3f} seconds for {len(queries)} queries")
+    return response.json()['results']
+
+# Helper function to run a batch, refreshing the token once if it was rejected
+def request_batch_with_token(queries):
+    access_token = token_manager.get()
+    if not access_token:
+        raise RuntimeError("Failed to get access token")
+    try:
+        return request_batch(queries, access_token)
+    except requests.exceptions.HTTPError as e:
+        if e.response is None or e.response.status_code not in (401, 403):
+            raise
+        logger.info("Access token expired or unauthorized, refreshing token and retrying...")
+        token_manager.invalidate(access_token)
+        access_token = token_manager.get()
+        if not access_token:
+            raise RuntimeError("Failed to refresh access token")
+        return request_batch(queries, access_token)
+
+# Helper function to get the end time of the dataset's latest refresh
+def last_refresh_time(access_token):
+    url = f"{POWERBI_API_URL}/datasets/{os.environ.get('DATASET_ID')}/refreshes?$top=1"
+    response = http_session.get(url, headers={'Authorization': f'Bearer {access_token}'})
+    response.raise_for_status()
+    refreshes = response.json().get('value', [])
+    if not refreshes:
+        return None
+    return refreshes[0].get('endTime') or refreshes[0].get('startTime')
+
+class DaxResultCache:
+    """
+    Cache of DAX query results keyed on dataset id and normalized query text.
+    Entries expire after a TTL, or as soon as the dataset reports a newer refresh.
+    At most max_entries results are kept, dropping the least recently used ones.
+    """
+
+    def __init__(self, ttl, refresh_check_seconds, max_entries):
+        self.ttl = ttl
+        self.refresh_check_seconds = refresh_check_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.refresh_time = None
+        self.refresh_checked = 0.0
+        self.stats = {"hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+    @staticmethod
+    def key(query):
+        # Collapse whitespace outside of string literals
+        parts = re.split(r'("(?:[^"]|"")*")', query.strip())
+        normalized = "".join(p if p.startswith('"') else re.sub(r"\s+", " ", p) for p in parts)
+        return os.environ.get('DATASET_ID'), normalized
+
+    # Drop every entry if the dataset was refreshed since the last check
+    def check_refresh(self):
+        if time.time() - self.refresh_checked < self.refresh_check_seconds:
+            return
+        self.refresh_checked = time.time()
+        try:
+            access_token = token_manager.get()
+            refresh_time = last_refresh_time(access_token) if access_token else None
+        except Exception as e:
+            logger.error(f"Error checking dataset refresh time: {str(e)}")
+            return
+        with self.lock:
+            if refresh_time != self.refresh_time:
+                if self.refresh_time is not None:
+                    logger.info("Dataset refreshed, clearing DAX result cache")
+                self.entries.clear()
+                self.refresh_time = refresh_time
+
+    # Return the cached entry of a query, with its result and result handle, or None
+    def get_entry(self, query):
+        self.check_refresh()
+        with self.lock:
+            key = self.key(query)
+            entry = self.entries.get(key)
+            if entry and time.time() - entry["time"] < self.ttl:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["saved_seconds"] += entry["latency"]
+                return entry
+            self.stats["misses"] += 1
+            return None
+
+    def get(self, query):
+        entry = self.get_entry(query)
+        return entry["result"] if entry else None
+
+    def put(self, query, result, latency):
+        with self.lock:
+            now = time.time()
+            # Drop expired entries, then the least recently used ones over the limit
+            for key in [key for key, entry in self.entries.items() if now - entry["time"] >= self.ttl]:
+                del self.entries[key]
+            key = self.key(query)
+            # Handle the result is stored under, reused by every hit instead of minting new ones
+            handle = uuid.uuid4().hex[:12]
+            self.entries[key] = {"result": result, "latency": latency, "time": now, "handle": handle}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return handle
+
+dax_cache = DaxResultCache(DAX_CACHE_TTL, DAX_REFRESH_CHECK_SECONDS, DAX_CACHE_MAX_ENTRIES)
+
+# DAX result shaping settings
+DAX_INLINE_ROWS = int(os.environ.get("DAX_INLINE_ROWS", 50))
+DAX_TOP_N = int(os.environ.get("DAX_TOP_N", 10))
+DAX_RESULT_HANDLES = int(os.environ.get("DAX_RESULT_HANDLES", 64))
+result_store = OrderedDict()
+result_store_lock = threading.Lock()
+
+# Helper function to convert DAX rows to a DataFrame with short column names
+def to_frame(rows):
+    df = pd.DataFrame.from_records(rows)
+    short = [re.sub(r"^.*\[(.*)\]$", r"\1", col) for col in df.columns]
+    # Keep the table name only where short names would collide
+    df.columns = [
+        name if short.count(name) == 1 else col.replace("[", ".").rstrip("]")
+        for name, col in zip(short, df.columns)
+    ]
+    return df
+
+# Helper function to keep a full result under a handle, dropping the oldest ones.
+# Passing the handle of a cached result stores it again under the same handle.
+def store_result(df, handle=None):
+    handle = handle or uuid.uuid4().hex[:12]
+    with result_store_lock:
+        result_store[handle] = df
+        result_store.move_to_end(handle)
+        while len(result_store) > DAX_RESULT_HANDLES:
+            result_store.popitem(last=False)
+    return handle
+
+# Helper function to get a stored result by handle
+def get_result(handle):
+    with result_store_lock:
+        return result_store.get(handle)
+
+# Helper function to convert a DataFrame to a dict of column lists
+def columnar(df):
+    return json.loads(df.to_json(orient="columns", date_format="iso"))
+
+# Helper function to turn DAX rows into a compact columnar result for the model
+def shape_result(rows, handle=None):
+    df = to_frame(rows)
+    handle = store_result(df, handle)
+    if len(df) <= DAX_INLINE_ROWS:
         return {
-            "status": "error",
-            "message": f"Error querying PowerBI data source: {str(http_err)}",
-            "result": "",
+            "handle": handle,
+            "row_count": len(df),
+            "columns": {col: list(values.values()) for col, values in columnar(df).items()},
         }
 
-    # Return the usable results
-    logger.info(f"DAX Query Time: {time.time() - t:.3f} seconds")
-    return response.json()['results'][0]['tables'][0]['rows']
+    # Summarize large results instead of returning every row
+    numeric = df.select_dtypes("number")
+    top = df.nlargest(DAX_TOP_N, numeric.columns[0]) if len(numeric.columns) else df.head(DAX_TOP_N)
+    return {
+        "handle": handle,
+        "row_count": len(df),
+        "summarized": True,
+        "column_names": list(df.columns),
+        "aggregates": {
+            col: {
+                "sum": float(numeric[col].sum()),
+                "mean": float(numeric[col].mean()),
+                "min": float(numeric[col].min()),
+                "max": float(numeric[col].max()),
+            }
+            for col in numeric.columns
+        },
+        "distinct_counts": {col: int(df[col].nunique()) for col in df.columns if col not in numeric.columns},
+        "top_rows": {col: list(values.values()) for col, values in columnar(top).items()},
+    }
+
+# Prefixes listed in the metadata bucket, so other objects in it are never enumerated
+TMDL_PREFIXES = ("tables/", "measures/", "relationships.tmdl")
+
+# Helper function to check if a blob is part of the TMDL metadata
+def is_metadata_blob(name):
+    if name == "relationships.tmdl":
+        return True
+    return name.startswith(("tables/", "measures/")) and name.endswith(".tmdl")
+
+# Helper function to get the local cache path of a blob
+def cache_path(name):
+    return os.path.join(TMDL_CACHE_DIR, *name.split("/"))
+
+# Helper function to download one blob into the disk cache, recording the generation seen in the listing
+def download_blob(blob, generation):
+    try:
+        text = blob.download_as_text()
+        path = cache_path(blob.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+        return blob.name, generation, text
+    except Exception as e:
+        logger.error(f"Error processing {blob.name}: {e}")
+        return blob.name, None, None
+
+# Helper function to sync the disk cache with the bucket, downloading only changed blobs
+def load_metadata():
+    global storage_client
+    with metadata_lock:
+        if time.time() - metadata_cache["checked"] < TMDL_REVALIDATE_SECONDS and metadata_cache["files"]:
+            return metadata_cache["files"]
+
+        t = time.time()
+        manifest_path = os.path.join(TMDL_CACHE_DIR, "manifest.json")
+        generations = metadata_cache["generations"]
+        if not generations and os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                generations = json.load(f)
+        files = dict(metadata_cache["files"])
+
+        # One listing per metadata prefix to revalidate every blob
+        if storage_client is None:
+            storage_client = storage.Client()
+        bucket = storage_client.bucket(TMDL_BUCKET)
+        blobs = [blob for prefix in TMDL_PREFIXES for blob in bucket.list_blobs(prefix=prefix) if is_metadata_blob(blob.name)]
+        current = {blob.name: str(blob.generation) for blob in blobs}
+
+        # Reuse unchanged blobs, from memory or disk
+        changed = []
+        for blob in blobs:
+            if generations.get(blob.name) == current[blob.name]:
+                if blob.name not in files and os.path.exists(cache_path(blob.name)):
+                    with open(cache_path(blob.name), encoding="utf-8") as f:
+                        files[blob.name] = f.read()
+                if blob.name in files:
+                    continue
+            changed.append(blob)
+
+        # Download changed blobs in parallel
+        changed_names = {blob.name for blob in changed}
+        new_generations = {name: current[name] for name in current if name in files and name not in changed_names}
+        if changed:
+            with ThreadPoolExecutor(max_workers=TMDL_DOWNLOAD_WORKERS) as executor:
+                for name, generation, text in executor.map(download_blob, changed, [current[blob.name] for blob in changed]):
+                    if generation is not None:
+                        files[name] = text
+                        new_generations[name] = generation
+                    elif name in generations and (name in files or os.path.exists(cache_path(name))):
+                        # Keep serving the cached copy, it is downloaded again on the next sync
+                        if name not in files:
+                            with open(cache_path(name), encoding="utf-8") as f:
+                                files[name] = f.read()
+                        new_generations[name] = generations[name]
+
+        # Forget blobs that were removed from the bucket
+        files = {name: text for name, text in files.items() if name in new_generations}
+        os.makedirs(TMDL_CACHE_DIR, exist_ok=True)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(new_generations, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        metadata_cache.update({"checked": time.time(), "files": files, "generations": new_generations})
+        logger.info(f"TMDL metadata synced in {time.time() - t:.3f} seconds, {len(changed)} blob(s) downloaded")
+        return files
 
 def powerbi_metadata():
     """
@@ -79,30 +408,16 @@ def powerbi_metadata():
     """
 
     try:
-        bucket = storage.Client().get_bucket("timesquare-retail")
+        files = load_metadata()
 
-        # Get data for tables
-        blobs = bucket.list_blobs(prefix="tables/")
-        tables_data = {}
-        for blob in blobs:
-            if blob.name.endswith(".tmdl"):  # Only process .tmdl files
-                try:
-                    tables_data[blob.name] = blob.download_as_text()
-                except Exception as e:
-                    logger.error(f"Error processing {blob.name}: {e}")
-
-        # Get data for measures
-        blobs = bucket.list_blobs(prefix="measures/")
-        measures_data = {}
-        for blob in blobs:
-            if blob.name.endswith(".tmdl"):  # Only process .tmdl files
-                try:
-                    measures_data[blob.name] = blob.download_as_text()
-                except Exception as e:
-                    logger.error(f"Error processing {blob.name}: {e}")
+        # Split data into tables and measures
+        tables_data = {name: text for name, text in files.items() if name.startswith("tables/")}
+        measures_data = {name: text for name, text in files.items() if name.startswith("measures/")}
 
         # Get relationship data
-        rel = bucket.blob("relationships.tmdl").download_as_text()
+        if "relationships.tmdl" not in files:
+            raise FileNotFoundError("relationships.tmdl not found in metadata bucket")
+        rel = files["relationships.tmdl"]
 
         logger.info(f"Successfully retrieved PowerBI metadata")
         return {
@@ -120,6 +435,58 @@ def powerbi_metadata():
             "result": "",
         }
 
+# Helper function to get the parsed schema index, rebuilt only when metadata changes
+def load_schema_index():
+    files = load_metadata()
+    with metadata_lock:
+        if schema_index["index"] is None or schema_index["generations"] != metadata_cache["generations"]:
+            embedder = None
+            if TMDL_EMBEDDING_MODEL:
+                import dspy
+                embedder = dspy.Embedder(TMDL_EMBEDDING_MODEL)
+            schema_index["index"] = SchemaIndex.from_files(files, embedder=embedder)
+            schema_index["generations"] = metadata_cache["generations"]
+        return schema_index["index"]
+
+def powerbi_schema(
+        question: str,
+) -> dict:
+
+    """
+    Return only the tables, columns, measures and relationships of the PowerBI dataset
+    that are relevant to a question. Use powerbi_metadata for the full raw metadata if
+    something needed is missing.
+
+    Args:
+        question (str): The user's analytics question
+
+    Returns:
+        dict: The relevant schema, and the names of the other tables
+    """
+
+    try:
+        index = load_schema_index()
+        selected = index.select(question, top_k=TMDL_SCHEMA_TOP_K)
+        if not selected:
+            # Nothing matched, fall back to the structure of every table
+            selected = list(index.tables)
+        schema = index.subset(selected)
+        logger.info(f"Selected {len(selected)} of {len(index.tables)} tables for question")
+        return {
+            "status": "success",
+            "message": f"Succefully retrieved PowerBI schema for {len(selected)} of {len(index.tables)} tables",
+            "tables": schema["tables"],
+            "relationships": schema["relationships"],
+            "other_tables": [name for name in index.tables if name not in selected],
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving PowerBI schema: {str(e)}")
+        return {
+            "status": "error",
+            "message": f"Error retrieving PowerBI schema: {str(e)}",
+            "result": "",
+        }
+
 def dax_query(
         query: str,
 ) -> dict:
@@ -134,61 +501,36 @@ def dax_query(
         dict: The status and query results
     """
 
-    global access_token
-    if not access_token:
-        logger.info("No access token found, retrieving new token...")
-        access_token = reconnect()
-        if not access_token:
-            return {
-                "status": "error",
-                "message": "Failed to get access token during initialization.",
-                "result": ""
-            }
+    cached = dax_cache.get_entry(query)
+    if cached is not None:
+        logger.info(f"Cache hit for: {query}")
+        return {
+            "status": "success",
+            "message": f"Succefully queried {query} to PowerBI data source (cached)",
+            "result": shape_result(cached["result"], cached["handle"]),
+        }
 
-    # Connect and execute DAX query
+    # Connect and execute DAX query, refreshing the token once if it was rejected
     try:
-        result = request_data(query, access_token)
+        t = time.time()
+        response = request_batch_with_token([query])[0]
+        if 'error' in response:
+            raise RuntimeError(str(response['error']))
+        result = response['tables'][0]['rows']
+        handle = dax_cache.put(query, result, time.time() - t)
         logger.info(f"Successfully queried: {query}")
         return {
             "status": "success",
             "message": f"Succefully queried {query} to PowerBI data source",
-            "result": result,
+            "result": shape_result(result, handle),
         }
     except requests.exceptions.HTTPError as e:
-        # Check if error is due to expired token (401 Unauthorized or 403 Forbidden)
-        if e.response is not None and e.response.status_code in (401, 403):
-            logger.info("Access token expired or unauthorized, refreshing token and retrying...")
-            # Refresh token
-            token = reconnect()
-            if not token:
-                return {
-                    "status": "error",
-                    "message": "Failed to refresh access token.",
-                    "result": ""
-                }
-            try:
-                # Retry with new token
-                result = request_data(query, token)
-                logger.info(f"Successfully queried after token refresh: {query}")
-                return {
-                    "status": "success",
-                    "message": f"Successfully queried {query} to PowerBI data source after token refresh",
-                    "result": result,
-                }
-            except Exception as retry_err:
-                logger.error(f"Failed after token refresh: {retry_err}")
-                return {
-                    "status": "error",
-                    "message": f"Failed querying after token refresh: {str(retry_err)}",
-                    "result": ""
-                }
-        else:
-            logger.error(f"Query failed: {str(e)}")
-            return {
-                "status": "error",
-                "message": f"Error querying PowerBI data source: {str(e)}",
-                "result": ""
-            }
+        logger.error(f"Query failed: {str(e)}")
+        return {
+            "status": "error",
+            "message": f"Error querying PowerBI data source: {str(e)}",
+            "result": ""
+        }
     except Exception as e:
         logger.error(f"Unexpected error querying PowerBI data source: {str(e)}")
         return {
@@ -196,3 +538,99 @@ def dax_query(
             "message": f"Unexpected error querying PowerBI data source: {str(e)}",
             "result": ""
         }
+
+def dax_queries(
+        queries: list[str],
+) -> dict:
+
+    """
+    Run several independent DAX queries against the PowerBI database at once.
+    Prefer this over repeated dax_query calls when a question needs several results.
+
+    Args:
+        queries (list[str]): The DAX queries in string format to run
+
+    Returns:
+        dict: The status and one result per query, in the same order as the queries
+    """
+
+    # Serve what we can from the cache and only send the rest
+    cached = {}
+    for i, query in enumerate(queries):
+        entry = dax_cache.get_entry(query)
+        if entry is not None:
+            cached[i] = entry
+    pending = [i for i in range(len(queries)) if i not in cached]
+    batches = [pending[i:i + DAX_BATCH_SIZE] for i in range(0, len(pending), DAX_BATCH_SIZE)]
+
+    # Run one batch and map its results back to query indexes
+    def run_batch(indexes):
+        try:
+            t = time.time()
+            results = request_batch_with_token([queries[i] for i in indexes])
+            latency = (time.time() - t) / len(indexes)
+            output = []
+            for i, result in zip(indexes, results):
+                if 'error' in result:
+                    output.append({"index": i, "status": "error", "message": str(result['error']), "result": ""})
+                else:
+                    rows = result['tables'][0]['rows']
+                    handle = dax_cache.put(queries[i], rows, latency)
+                    output.append({"index": i, "status": "success", "result": shape_result(rows, handle)})
+            return output
+        except Exception as e:
+            logger.error(f"Batch query failed: {str(e)}")
+            return [{"index": i, "status": "error", "message": str(e), "result": ""} for i in indexes]
+
+    try:
+        t = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(DAX_MAX_PARALLEL, len(batches)))) as executor:
+            results = [r for batch in executor.map(run_batch, batches) for r in batch]
+        results += [{"index": i, "status": "success", "result": shape_result(entry["result"], entry["handle"]), "cached": True}
+                    for i, entry in cached.items()]
+        failed = sum(1 for r in results if r["status"] != "success")
+        logger.info(f"Ran {len(queries)} DAX queries in {len(batches)} request(s), {time.time() - t:.3f} seconds")
+        return {
+            "status": "success" if not failed else ("partial" if failed < len(results) else "error"),
+            "message": f"Succefully ran {len(results) - failed} of {len(results)} queries against PowerBI data source",
+            "results": sorted(results, key=lambda r: r["index"]),
+        }
+    except Exception as e:
+        logger.error(f"Unexpected error querying PowerBI data source: {str(e)}")
+        return {
+            "status": "error",
+            "message": f"Unexpected error querying PowerBI data source: {str(e)}",
+            "results": [],
+        }
+
+def dax_result(
+        handle: str,
+        offset: int,
+        limit: int,
+) -> dict:
+
+    """
+    Get rows of a full DAX result that was summarized, for example to build a chart.
+
+    Args:
+        handle (str): The handle returned with a dax_query or dax_queries result
+        offset (int): The first row to return
+        limit (int): The number of rows to return
+
+    Returns:
+        dict: The status and the requested rows in columnar form
+    """
+
+    df = get_result(handle)
+    if df is None:
+        return {
+            "status": "error",
+            "message": f"No stored result for handle {handle}, run the query again",
+            "result": "",
+        }
+    page = df.iloc[offset:offset + limit]
+    return {
+        "status": "success",
+        "message": f"Succefully retrieved rows {offset} to {offset + len(page)} of {len(df)}",
+        "result": {col: list(values.values()) for col, values in columnar(page).items()},
+    }
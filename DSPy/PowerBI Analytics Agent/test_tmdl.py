@@ -0,0 +1,40 @@
+"""
+Tests for the TMDL parser.
+"""
+
+import unittest
+from tmdl import parse_tables, SchemaIndex
+
+MEASURES = (
+    "table Measures\n"
+    "\tmeasure 'Total Sales' =\n"
+    "\t\t\tVAR amount = SUM(Sales[Amount])\n"
+    "\t\t\tRETURN amount\n"
+    "\t\tformatString: #,0.00\n"
+    "\t\tdisplayFolder: Sales\n"
+    "\t\tlineageTag: 1b2c3d4e\n"
+    "\t\tchangedProperty = FormatString\n"
+    "\t\tannotation PBI_FormatHint = {\"isDecimal\":true}\n"
+    "\n"
+    "\tmeasure Orders = COUNTROWS(Sales)\n"
+    "\t\tannotation PBI_FormatHint = {\"isGeneralNumber\":true}\n"
+)
+
+
+class ParseTablesTest(unittest.TestCase):
+
+    def test_annotated_measure(self):
+        measures = parse_tables([MEASURES])["Measures"]["measures"]
+        self.assertEqual(measures["Total Sales"]["expression"], "VAR amount = SUM(Sales[Amount]) RETURN amount")
+        self.assertEqual(measures["Total Sales"]["formatString"], "#,0.00")
+        self.assertEqual(measures["Total Sales"]["displayFolder"], "Sales")
+        self.assertEqual(measures["Orders"]["expression"], "COUNTROWS(Sales)")
+
+    def test_subset_expressions(self):
+        index = SchemaIndex(parse_tables([MEASURES]), [])
+        subset = index.subset(["Measures"])
+        self.assertNotIn("annotation", " ".join(subset["tables"]["Measures"]["measures"].values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+"""
+Parser and relevance index for PowerBI TMDL metadata.
+"""
+
+import re
+import logging
+import numpy as np
+
+logger = logging.getLogger()
+
+# Helper function to remove TMDL quoting from a name
+def unquote(name):
+    name = name.strip()
+    if len(name) >= 2 and name[0] == name[-1] == "'":
+        return name[1:-1].replace("''", "'")
+    return name
+
+# Helper function to split a Table.Column reference, allowing quoted names
+def split_reference(ref):
+    match = re.match(r"^\s*('(?:[^']|'')*'|[^.]+)\.('(?:[^']|'')*'|.+)\s*$", ref)
+    if not match:
+        return unquote(ref), ""
+    return unquote(match.group(1)), unquote(match.group(2))
+
+# Helper function to get the indentation depth of a line
+def depth(line):
+    return len(line) - len(line.lstrip("\t"))
+
+# Parse the text of TMDL table or measure files into tables, columns and measures
+def parse_tables(texts, tables=None):
+    tables = {} if tables is None else tables
+    for text in texts:
+        table = None
+        current = None
+        # Whether the current measure expression can continue on the following lines
+        expression = False
+        for line in text.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith("///"):
+                continue
+            level = depth(line)
+            if level == 0:
+                match = re.match(r"^(?:createOrReplace\s+)?table\s+(.+)$", stripped)
+                table = tables.setdefault(unquote(match.group(1)), {"columns": {}, "measures": {}}) if match else None
+                current = None
+            elif table is None:
+                continue
+            elif level == 1:
+                current = None
+                expression = False
+                column = re.match(r"^column\s+('(?:[^']|'')*'|[^=]+?)\s*(?:=.*)?$", stripped)
+                measure = re.match(r"^measure\s+('(?:[^']|'')*'|[^=]+?)\s*=\s*(.*)$", stripped)
+                if column:
+                    current = table["columns"].setdefault(unquote(column.group(1)), {"dataType": ""})
+                elif measure:
+                    current = {"expression": measure.group(2).strip().strip("`")}
+                    expression = True
+                    table["measures"][unquote(measure.group(1))] = current
+            elif current is not None:
+                if expression and level > 2:
+                    # Multi-line measure expression, indented deeper than the measure's properties
+                    current["expression"] = (current["expression"] + " " + stripped.strip("`")).strip()
+                    continue
+                # Any property (formatString, lineageTag, annotation, changedProperty, ...) ends the expression
+                expression = False
+                prop = re.match(r"^(dataType|formatString|description|displayFolder)\s*:\s*(.*)$", stripped)
+                if prop:
+                    current[prop.group(1)] = prop.group(2).strip()
+    return tables
+
+# Parse relationships.tmdl into a list of column pairs
+def parse_relationships(text):
+    relationships = []
+    current = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if depth(line) == 0 and stripped.startswith("relationship"):
+            current = {}
+            relationships.append(current)
+        elif current is not None:
+            prop = re.match(r"^(fromColumn|toColumn)\s*:\s*(.*)$", stripped)
+            if prop:
+                table, column = split_reference(prop.group(2))
+                key = "from" if prop.group(1) == "fromColumn" else "to"
+                current[f"{key}_table"] = table
+                current[f"{key}_column"] = column
+    return [r for r in relationships if "from_table" in r and "to_table" in r]
+
+# Helper function to split names and questions into lowercase words
+def tokenize(text):
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) > 2}
+
+
+class SchemaIndex:
+    """
+    Structured index of a TMDL semantic model that can return the part relevant to a question.
+    """
+
+    def __init__(self, tables, relationships, embedder=None):
+        self.tables = tables
+        self.relationships = relationships
+        self.embedder = embedder
+        self.embeddings = None
+        self.tokens = {}
+        for name, table in tables.items():
+            words = tokenize(name)
+            words_weighted = {word: 3 for word in words}
+            for column in table["columns"]:
+                for word in tokenize(column):
+                    words_weighted.setdefault(word, 1)
+            for measure in table["measures"]:
+                for word in tokenize(measure):
+                    words_weighted[word] = max(words_weighted.get(word, 0), 2)
+            self.tokens[name] = words_weighted
+
+    @classmethod
+    def from_files(cls, files, embedder=None):
+        table_texts = [text for name, text in files.items() if name.startswith("tables/")]
+        measure_texts = [text for name, text in files.items() if name.startswith("measures/")]
+        tables = parse_tables(table_texts)
+        parse_tables(measure_texts, tables)
+        relationships = parse_relationships(files.get("relationships.tmdl", ""))
+        return cls(tables, relationships, embedder)
+
+    # Text describing a table, used for embedding
+    def describe(self, name):
+        table = self.tables[name]
+        return f"{name}: " + ", ".join(list(table["columns"]) + list(table["measures"]))
+
+    # Score every table against the question by keywords and, if available, embeddings
+    def score(self, question):
+        words = tokenize(question)
+        scores = {
+            name: sum(weight for word, weight in tokens.items()
+                      if word in words or any(w.startswith(word) or word.startswith(w) for w in words if len(w) > 3))
+            for name, tokens in self.tokens.items()
+        }
+        if self.embedder is not None:
+            try:
+                names = list(self.tables)
+                if self.embeddings is None:
+                    self.embeddings = np.asarray(self.embedder([self.describe(n) for n in names]), dtype=np.float32)
+                    self.embeddings /= np.linalg.norm(self.embeddings, axis=1, keepdims=True) + 1e-9
+                query = np.asarray(self.embedder([question])[0], dtype=np.float32)
+                similarity = self.embeddings @ (query / (np.linalg.norm(query) + 1e-9))
+                for name, sim in zip(names, similarity):
+                    scores[name] += 5 * max(float(sim), 0.0)
+            except Exception as e:
+                logger.error(f"Schema embedding failed, using keywords only: {e}")
+                self.embedder = None
+        return scores
+
+    # Return the tables relevant to a question, expanded one hop along relationships
+    def select(self, question, top_k=5):
+        scores = self.score(question)
+        ranked = [name for name, score in sorted(scores.items(), key=lambda x: -x[1]) if score > 0][:top_k]
+        selected = set(ranked)
+        for rel in self.relationships:
+            if rel["from_table"] in ranked:
+                selected.add(rel["to_table"])
+            if rel["to_table"] in ranked:
+                selected.add(rel["from_table"])
+        # Measure-only tables that reference selected tables
+        for name, table in self.tables.items():
+            if not table["columns"] and table["measures"]:
+                expressions = " ".join(m["expression"] for m in table["measures"].values())
+                if any(re.search(rf"'?{re.escape(t)}'?\[", expressions) for t in selected):
+                    selected.add(name)
+        return [name for name in self.tables if name in selected]
+
+    # Compact structure of the selected tables and the relationships between them
+    def subset(self, names):
+        names = set(names)
+        return {
+            "tables": {
+                name: {
+                    "columns": {col: info.get("dataType", "") for col, info in self.tables[name]["columns"].items()},
+                    "measures": {m: info["expression"] for m, info in self.tables[name]["measures"].items()},
+                }
+                for name in self.tables if name in names
+            },
+            "relationships": [
+                f"{r['from_table']}[{r['from_column']}] -> {r['to_table']}[{r['to_column']}]"
+                for r in self.relationships
+                if r["from_table"] in names and r["to_table"] in names
+            ],
+        }
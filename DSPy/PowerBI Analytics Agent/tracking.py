@@ -0,0 +1,78 @@
+import time
+import threading
+from dspy.utils.callback import BaseCallback
+
+# Records tokens, cost and latency for every LM and tool call of a single request
+class CallRecorder(BaseCallback):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.calls = []
+
+    def on_lm_start(self, call_id, instance, inputs):
+        self.pending[call_id] = (time.time(), instance, None)
+
+    def on_lm_end(self, call_id, outputs, exception=None):
+        start, lm, _ = self.pending.pop(call_id, (time.time(), None, None))
+        # Each request uses its own LM copy, so the last history entry belongs to this call
+        entry = lm.history[-1] if lm is not None and lm.history else {}
+        usage = entry.get("usage") or {}
+        self._add({
+            "type": "lm",
+            "name": getattr(lm, "model", "lm"),
+            "start": start,
+            "latency": time.time() - start,
+            "prompt_tokens": usage.get("prompt_tokens", 0) or 0,
+            "completion_tokens": usage.get("completion_tokens", 0) or 0,
+            "cost": entry.get("cost") or 0.0,
+            "error": str(exception) if exception else None,
+        })
+
+    def on_tool_start(self, call_id, instance, inputs):
+        self.pending[call_id] = (time.time(), instance, inputs)
+
+    def on_tool_end(self, call_id, outputs, exception=None):
+        start, tool, inputs = self.pending.pop(call_id, (time.time(), None, None))
+        self._add({
+            "type": "tool",
+            "name": getattr(tool, "name", "tool"),
+            "start": start,
+            "latency": time.time() - start,
+            "args": (inputs or {}).get("kwargs", inputs),
+            "status": outputs.get("status") if isinstance(outputs, dict) else None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cost": 0.0,
+            "error": str(exception) if exception else None,
+        })
+
+    def _add(self, record):
+        with self.lock:
+            self.calls.append(record)
+
+    # Totals for the whole request
+    def summary(self):
+        lm_calls = [c for c in self.calls if c["type"] == "lm"]
+        return {
+            "lm_calls": len(lm_calls),
+            "tool_calls": len(self.calls) - len(lm_calls),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in lm_calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in lm_calls),
+            "cost": sum(c["cost"] for c in lm_calls),
+            "lm_latency": sum(c["latency"] for c in lm_calls),
+            "tool_latency": sum(c["latency"] for c in self.calls if c["type"] == "tool"),
+            "calls": sorted(self.calls, key=lambda c: c["start"]),
+        }
+
+# Convert recorded calls into the event format shown by the Event Logger
+def to_events(calls):
+    events = []
+    for call in calls:
+        metrics = {k: call[k] for k in ("latency", "prompt_tokens", "completion_tokens", "cost", "error")}
+        if call["type"] == "tool":
+            events.append({"content": {"parts": [{"function_call": {"name": call["name"], "args": call.get("args")}}]},
+                           "metrics": metrics})
+        else:
+            text = f"LM {call['name']}: {call['prompt_tokens']}+{call['completion_tokens']} tokens, {call['latency']:.2f}s"
+            events.append({"content": {"parts": [{"text": text}]}, "metrics": metrics})
+    return events
@@ -0,0 +1,110 @@
+# Backends the chatbot can use to talk to the RAG/SQL agent
+import asyncio
+import inspect
+import queue
+import threading
+from vertexai import agent_engines
+
+
+class RemoteBackend:
+    """
+    Runs the agent deployed on Vertex AI Agent Engine. Every turn and session is a remote call.
+    """
+
+    mode = "remote"
+
+    def __init__(self, resource_id):
+        self.app = agent_engines.get(resource_id)
+
+    def create_session(self, user_id):
+        return self.app.create_session(user_id=user_id)
+
+    def stream_query(self, user_id, session_id, message):
+        yield from self.app.stream_query(user_id=user_id, session_id=session_id, message=message)
+
+
+class LocalBackend:
+    """
+    Runs `root_agent` in this process with an ADK Runner, skipping the Agent Engine round trip.
+    Sessions are kept in memory, or in SQLite when a database path is given.
+    """
+
+    mode = "local"
+
+    def __init__(self, app_name, session_db=None):
+        from google import adk
+        from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+        from rag_agent.agent import root_agent
+
+        self.app_name = app_name
+        if session_db:
+            self.session_service = DatabaseSessionService(db_url=f"sqlite:///{session_db}")
+        else:
+            self.session_service = InMemorySessionService()
+        self.runner = adk.Runner(agent=root_agent, app_name=app_name, session_service=self.session_service)
+
+    def create_session(self, user_id):
+        session = self.session_service.create_session(app_name=self.app_name, user_id=user_id)
+        if inspect.isawaitable(session):
+            session = asyncio.run(session)
+        return {"id": session.id}
+
+    def stream_query(self, user_id, session_id, message):
+        from google.genai import types
+
+        content = types.Content(role="user", parts=[types.Part(text=message)])
+        for event in self.runner.run(user_id=user_id, session_id=session_id, new_message=content):
+            # Same dict shape as the events returned by Agent Engine
+            yield event.model_dump(mode="json", exclude_none=True)
+
+
+# Build the backend selected by AGENT_MODE ("remote" or "local")
+def create_backend(mode, resource_id, session_db=None):
+    if mode == "local":
+        return LocalBackend(app_name=resource_id or "rag_agent", session_db=session_db)
+    return RemoteBackend(resource_id)
+
+
+class SessionPool:
+    """
+    Small pool of pre-created agent sessions, refilled on a background thread,
+    so starting a conversation does not wait on create_session.
+    """
+
+    def __init__(self, backend, user_id, size=0):
+        self.backend = backend
+        self.user_id = user_id
+        self.size = size
+        self.sessions = queue.Queue()
+        self.lock = threading.Lock()
+        self.refilling = False
+        self.refill()
+
+    # Take a session from the pool, creating one directly if the pool is empty
+    def acquire(self):
+        try:
+            session_id = self.sessions.get_nowait()
+        except queue.Empty:
+            session_id = self.backend.create_session(self.user_id)["id"]
+        self.refill()
+        return session_id
+
+    # Start a background refill if one is not already running
+    def refill(self):
+        if self.size <= 0:
+            return
+        with self.lock:
+            if self.refilling:
+                return
+            self.refilling = True
+        threading.Thread(target=self._fill, daemon=True).start()
+
+    def _fill(self):
+        try:
+            while self.sessions.qsize() < self.size:
+                self.sessions.put(self.backend.create_session(self.user_id)["id"])
+        except Exception as e:
+            print(f"Error refilling session pool: {e}")
+        finally:
+            with self.lock:
+                self.refilling = False
@@ -0,0 +1,152 @@
+# Semantic cache for final chatbot answers, keyed on question embeddings
+import re
+import time
+import threading
+import numpy as np
+from vertexai import rag
+from vertexai.language_models import TextEmbeddingInput, TextEmbeddingModel
+
+# Embedding model used for questions, kept here so the frontend does not import the agent package
+DEFAULT_CACHE_MODEL = "publishers/google/models/text-embedding-005"
+
+# Tools that only read data, answers built from these are safe to reuse
+READ_ONLY_TOOLS = {"query", "sql_query", "table_structure", "list_tables", "list_corpora", "get_corpus_info",
+                   "corpus_catalog", "approx_query"}
+# Tools that actually look at business data, answers without them are conversational
+DATA_TOOLS = {"query", "sql_query", "approx_query"}
+
+
+class SemanticCache:
+    """
+    In-memory cache of final answers and graphs for analytics questions.
+
+    Questions are embedded and compared with cosine similarity. Each entry records
+    the versions of the corpora and tables it was built from, and is dropped as soon
+    as any of those versions changes. Table versions come from the table_versions
+    callable, so the cache does not depend on the agent package.
+    """
+
+    def __init__(self, embedding_model, table_versions, threshold=0.92, max_entries=256, max_age=24 * 3600,
+                 versions_ttl=30):
+        self.model = TextEmbeddingModel.from_pretrained(embedding_model.split("/")[-1])
+        self.table_versions = table_versions
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.versions_ttl = versions_ttl
+        self.entries = []
+        self.vectors = None
+        self.lock = threading.Lock()
+        self._versions = None
+        self._versions_time = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    # Embed a question as a unit vector
+    def embed(self, text):
+        inputs = [TextEmbeddingInput(text.strip().lower(), "SEMANTIC_SIMILARITY")]
+        vector = np.asarray(self.model.get_embeddings(inputs)[0].values, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    # Current version of every corpus and table, refreshed at most every versions_ttl seconds.
+    # Raises if they cannot be read, since nothing could be validated or cached without them.
+    def data_versions(self):
+        if self._versions is not None and time.time() - self._versions_time < self.versions_ttl:
+            return self._versions
+        versions = {}
+        try:
+            for corpus in rag.list_corpora():
+                version = str(getattr(corpus, "update_time", ""))
+                versions[f"corpus:{corpus.name}"] = version
+                versions[f"corpus:{corpus.display_name}"] = version
+        except Exception as e:
+            raise RuntimeError(f"Could not list corpora for cache validation: {e}") from e
+        try:
+            for table, version in self.table_versions().items():
+                versions[f"table:{table}"] = version
+        except Exception as e:
+            raise RuntimeError(f"Could not list tables for cache validation: {e}") from e
+        self._versions = versions
+        self._versions_time = time.time()
+        return versions
+
+    # Work out which corpora and tables a turn read from its tool calls, None if it should not be cached
+    def dependencies(self, function_calls):
+        names = {call.get("name") for call in function_calls}
+        if not names & DATA_TOOLS or not names <= READ_ONLY_TOOLS:
+            return None
+        versions = self.data_versions()
+        deps = set()
+        tables = [key.split(":", 1)[1] for key in versions if key.startswith("table:")]
+        for call in function_calls:
+            args = call.get("args", {}) or {}
+            if call.get("name") == "query":
+                corpus = args.get("corpus_name", "")
+                if corpus:
+                    deps.add(f"corpus:{corpus}")
+                else:
+                    # Current corpus is unknown here, so depend on all of them
+                    deps.update(key for key in versions if key.startswith("corpus:"))
+            elif call.get("name") == "sql_query":
+                sql = args.get("query", "")
+                if not re.match(r"^\s*(SELECT|WITH|SHOW|DESCRIBE)\b", sql, re.IGNORECASE):
+                    return None
+                deps.update(f"table:{t}" for t in tables if re.search(rf"\b{re.escape(t)}\b", sql, re.IGNORECASE))
+            elif call.get("name") in ("table_structure", "approx_query"):
+                deps.add(f"table:{args.get('table', '')}")
+        return {dep: versions.get(dep) for dep in deps}
+
+    # Return a cached (text, graphs) answer for a similar question, or None.
+    # The question's vector can be passed in so it is embedded once for lookup and store.
+    def lookup(self, question, vector=None):
+        with self.lock:
+            if not self.entries:
+                self.misses += 1
+                return None
+        vector = self.embed(question) if vector is None else vector
+        with self.lock:
+            scores = self.vectors @ vector
+            order = np.argsort(scores)[::-1]
+            candidates = [self.entries[i] for i in order if scores[i] >= self.threshold]
+        versions = self.data_versions() if candidates else None
+        for entry in candidates:
+            if time.time() - entry["time"] > self.max_age:
+                self.invalidate(entry)
+                continue
+            if any(versions.get(dep) != v for dep, v in entry["deps"].items()):
+                self.invalidate(entry)
+                continue
+            self.hits += 1
+            return entry["text"], entry["graphs"]
+        self.misses += 1
+        return None
+
+    # Store a final answer along with the tool calls that produced it
+    def store(self, question, text, graphs, function_calls, vector=None):
+        deps = self.dependencies(function_calls)
+        if deps is None:
+            return False
+        vector = self.embed(question) if vector is None else vector
+        with self.lock:
+            self.entries.append({"question": question, "text": text, "graphs": graphs,
+                                 "deps": deps, "time": time.time()})
+            self.vectors = vector[None, :] if self.vectors is None else np.vstack([self.vectors, vector])
+            if len(self.entries) > self.max_entries:
+                self.entries = self.entries[1:]
+                self.vectors = self.vectors[1:]
+        return True
+
+    # Remove a single entry
+    def invalidate(self, entry):
+        with self.lock:
+            if entry in self.entries:
+                idx = self.entries.index(entry)
+                del self.entries[idx]
+                self.vectors = np.delete(self.vectors, idx, axis=0)
+
+    # Drop everything
+    def clear(self):
+        with self.lock:
+            self.entries = []
+            self.vectors = None
+            self._versions = None
@@ -1,11 +1,16 @@
 # Web implementation of chatbot with RAG and SQL analytical features
 import os
+import time
+import uuid
 import vertexai
-from vertexai import agent_engines
 import streamlit as st
 from dotenv import load_dotenv
 import json
 import plotly.graph_objs as go
+from answer_cache import SemanticCache, DEFAULT_CACHE_MODEL
+from table_versions import table_versions
+from agent_backend import SessionPool, create_backend
+from event_timeline import build_timeline, function_calls, timeline_json
 
 load_dotenv()
 # Setting up Vertex Agent
@@ -14,33 +19,78 @@ vertexai.init(
     location=os.environ.get("LOCATION"),
     staging_bucket=os.environ.get("BUCKET_ID"),
 )
-remote_app = agent_engines.get(os.environ.get("RESOURCE_ID"))
 user_id = os.environ.get("USER_ID")
+
+# AGENT_MODE=local runs root_agent in-process, otherwise the deployed Agent Engine is used
+@st.cache_resource
+def get_backend():
+  return create_backend(
+    os.environ.get("AGENT_MODE", "remote").lower(),
+    os.environ.get("RESOURCE_ID"),
+    session_db=os.environ.get("LOCAL_SESSION_DB"),
+  )
+
+agent_app = get_backend()
+
+# Pre-created sessions shared by all browser tabs, SESSION_POOL_SIZE=0 disables the pool
+@st.cache_resource
+def get_session_pool():
+  return SessionPool(agent_app, user_id, size=int(os.environ.get("SESSION_POOL_SIZE", 2)))
  
 # ---- Helper Functions ----
 
-# Gets a response from the bot
+# Gets a response from the bot, along with a timeline of every streamed event
 def query_bot(session_id, message):
+  t = time.time()
+  records = []
   final_response = None
-  for event in remote_app.stream_query(
+  for event in agent_app.stream_query(
     user_id=user_id,
     session_id=session_id,
     message=message
   ):
-    # Print event for debugging
-    print(event)
+    records.append({"t": time.time() - t, "event": event})
     final_response = event
-  if "content" in final_response and "parts" in final_response["content"] and "text" in final_response["content"]["parts"][0]:
-    return final_response["content"]["parts"][0]["text"]
+  timeline = build_timeline(records, time.time() - t)
+  print(f"[{agent_app.mode}] Turn took {timeline['total']:.2f}s, first event after {timeline['time_to_first_event']}s")
+  if final_response and "content" in final_response and "parts" in final_response["content"] and "text" in final_response["content"]["parts"][0]:
+    return final_response["content"]["parts"][0]["text"], timeline
   else:
-    return "No response from AI Engine"
+    return "No response from AI Engine", timeline
 
-# Create new session
+# Shared semantic answer cache, one per server process. Only opening questions of a chat are
+# looked up and stored, since later turns depend on the session's history and current corpus.
+@st.cache_resource
+def get_answer_cache():
+  if os.environ.get("SEMANTIC_CACHE", "false").lower() != "true":
+    return None
+  cache = SemanticCache(
+    os.environ.get("SEMANTIC_CACHE_MODEL", DEFAULT_CACHE_MODEL),
+    table_versions,
+    threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.92)),
+    max_age=float(os.environ.get("SEMANTIC_CACHE_MAX_AGE", 24 * 3600)),
+  )
+  # Fail at startup if the cache is enabled but cannot validate answers, instead of never caching
+  cache.data_versions()
+  return cache
+
+# Create new session, the agent session itself is only attached on the first message
 def new_session():
-  session = remote_app.create_session(user_id=user_id)
-  st.session_state.current_session = session['id']
-  st.session_state.sessions[session['id']] = {"name":f"New Session",
-                                                        "messages":[]}
+  key = uuid.uuid4().hex
+  st.session_state.current_session = key
+  st.session_state.sessions[key] = {"name":f"New Session",
+                                    "id": None,
+                                    "messages":[],
+                                    # Turns answered from the cache, which the agent session has not seen yet
+                                    "unsent":[]}
+
+# Agent session id for the current chat, taken from the pool on first use
+def current_session_id():
+  session = st.session_state.sessions[st.session_state.current_session]
+  if session["id"] is None:
+    session["id"] = get_session_pool().acquire()
+  return session["id"]
+
 # Delete current session
 def delete_session():
   del st.session_state.sessions[st.session_state.current_session]
@@ -52,6 +102,17 @@ def delete_session():
 # Clear current chat without deleting session
 def clear_chat():
   st.session_state.sessions[st.session_state.current_session]["messages"] = []
+  st.session_state.sessions[st.session_state.current_session]["unsent"] = []
+
+# Message for the agent, with any turns answered from the cache passed along as earlier context
+def agent_message(prompt):
+  session = st.session_state.sessions[st.session_state.current_session]
+  unsent = session.get("unsent", [])
+  if not unsent:
+    return prompt
+  session["unsent"] = []
+  context = "\n\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in unsent)
+  return f"Earlier in this conversation:\n{context}\n\n{prompt}"
 
 # Uses HighCharts API to create a HTML graph
 def create_graph(graph):
@@ -85,9 +146,16 @@ def split_response(response):
       # If no graphs, return text only
       return response, None
 
+# Show the event timeline of a turn with a JSON export
+def display_timeline(timeline, key):
+  with st.expander(f"⏱️ Timeline: {timeline['total']:.2f}s total, first event {timeline['time_to_first_event'] or 0:.2f}s, tools {timeline['tool_time']:.2f}s"):
+    st.dataframe(timeline["steps"], hide_index=True)
+    st.download_button("Export JSON", timeline_json(timeline), file_name=f"timeline_{key}.json",
+                       mime="application/json", key=f"timeline_{key}")
+
 # Function to display chat history with graphs
 def display_chat_history():
-  for msg in st.session_state.sessions[st.session_state.current_session]["messages"]:
+  for idx, msg in enumerate(st.session_state.sessions[st.session_state.current_session]["messages"]):
     if msg["role"] == "user":
       with st.chat_message("user"):
         st.markdown(msg["content"])
@@ -98,13 +166,16 @@ def display_chat_history():
         for graph in msg['graphs']:
           # Display graph as html
           st.components.v1.html(graph, height=500)
+      if msg.get("timeline"):
+        display_timeline(msg["timeline"], f"{st.session_state.current_session}_{idx}")
 
 # Persistent data
 if "sessions" not in st.session_state:
   st.session_state.sessions = {}
 if "current_session" not in st.session_state:
-  st.session_state.current_session = 0
   new_session()
+  # Warm the pool in the background while the user types
+  get_session_pool()
 
 # ---------- Top Bar Layout ----------
 with st.sidebar.expander("Session Manager", expanded=True):
@@ -144,19 +215,46 @@ display_chat_history()
 # Ask for user query
 prompt = st.chat_input("Type your query here...")
 if prompt:
-  st.session_state.sessions[st.session_state.current_session]["messages"].append({"role": "user", "content": prompt})
+  # Opening question of a chat whose agent session has no history yet
+  session = st.session_state.sessions[st.session_state.current_session]
+  first_turn = not session["messages"] and session["id"] is None
+  session["messages"].append({"role": "user", "content": prompt})
   with st.chat_message("user"):
     st.markdown(prompt)
     # Query chatbot with user prompt
   with st.chat_message("assistant"):
     with st.spinner("Thinking..."):
-      response = query_bot(st.session_state.current_session, prompt)
-      text, graphs = split_response(response)
+      cache = get_answer_cache() if first_turn else None
+      cached = None
+      try:
+        vector = cache.embed(prompt) if cache else None
+        cached = cache.lookup(prompt, vector) if cache else None
+      except Exception as e:
+        st.warning(f"Answer cache unavailable: {e}")
+        cache = None
+      timeline = None
+      if cached:
+        text, graphs = cached
+        session.setdefault("unsent", []).append((prompt, text))
+        st.caption("⚡ Answered from cache")
+      else:
+        response, timeline = query_bot(current_session_id(), agent_message(prompt))
+        text, graphs = split_response(response)
+        if cache:
+          try:
+            cache.store(prompt, text, graphs, function_calls(timeline), vector)
+          except Exception as e:
+            st.warning(f"Answer was not cached: {e}")
       st.markdown(text)
-      # Append response and graphs if needed
+      # Append response, graphs and timeline if needed
+      message = {"role": "assistant", "content": text}
       if (graphs):
-        st.session_state.sessions[st.session_state.current_session]["messages"].append({"role": "assistant", "content": text, "graphs": graphs})
+        message["graphs"] = graphs
         for graph in graphs:
           st.components.v1.html(graph, height=500)
-      else:
-        st.session_state.sessions[st.session_state.current_session]["messages"].append({"role": "assistant", "content": text})
+      if timeline:
+        message["timeline"] = timeline
+      messages = st.session_state.sessions[st.session_state.current_session]["messages"]
+      messages.append(message)
+      if timeline:
+        display_timeline(timeline, f"{st.session_state.current_session}_{len(messages) - 1}")
@@ -0,0 +1,66 @@
+# Builds a per-turn timeline from timestamped agent stream events
+import json
+
+
+# Classify a single event part
+def part_kind(part):
+  if "function_call" in part:
+    return "function_call", part["function_call"].get("name", "N/A")
+  if "function_response" in part:
+    return "function_response", part["function_response"].get("name", "N/A")
+  if "text" in part:
+    text = part["text"] or ""
+    return ("thinking" if part.get("thought") else "text"), text[:40]
+  return "other", ""
+
+# Turn a list of {"t": seconds since turn start, "event": event} records into timeline steps
+def build_timeline(records, total):
+  steps = []
+  calls = {}
+  previous = 0.0
+  for record in records:
+    t = record["t"]
+    for part in record["event"].get("content", {}).get("parts", []):
+      kind, name = part_kind(part)
+      if kind == "function_call":
+        calls[part["function_call"].get("id") or name] = t
+      if kind == "function_response":
+        # Tool time is measured from the matching call
+        call_id = part["function_response"].get("id") or name
+        start = calls.pop(call_id, previous)
+      else:
+        # Model time is measured from the previous event
+        start = previous
+      steps.append({
+        "kind": kind,
+        "name": name,
+        "start": round(start, 3),
+        "end": round(t, 3),
+        "duration": round(t - start, 3),
+      })
+    previous = t
+  # The last text step is the final answer
+  for step in reversed(steps):
+    if step["kind"] == "text":
+      step["kind"] = "final_text"
+      break
+  return {
+    "time_to_first_event": round(records[0]["t"], 3) if records else None,
+    "total": round(total, 3),
+    "tool_time": round(sum(s["duration"] for s in steps if s["kind"] == "function_response"), 3),
+    "steps": steps,
+    "events": records,
+  }
+
+# Function calls (name and args) made during the turn
+def function_calls(timeline):
+  calls = []
+  for record in timeline["events"]:
+    for part in record["event"].get("content", {}).get("parts", []):
+      if "function_call" in part:
+        calls.append(part["function_call"])
+  return calls
+
+# Export a timeline as a JSON string for offline analysis
+def timeline_json(timeline):
+  return json.dumps(timeline, indent=2, default=str)
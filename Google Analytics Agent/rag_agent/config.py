@@ -21,4 +21,14 @@ DEFAULT_CHUNK_SIZE = 512
 DEFAULT_CHUNK_OVERLAP = 100
 DEFAULT_TOP_K = 3
 DEFAULT_DISTANCE_THRESHOLD = 0.5
-DEFAULT_EMBEDDING_MODEL = "publishers/google/models/text-embedding-005"
\ No newline at end of file
+DEFAULT_EMBEDDING_MODEL = "publishers/google/models/text-embedding-005"
+
+# Tool settings
+DEFAULT_DELETE_CONCURRENCY = 8
+CATALOG_CONCURRENCY = 8
+CATALOG_REFRESH_SECONDS = 300
+DEFAULT_FILE_PAGE_SIZE = 50
+
+# Approximate query settings
+APPROX_SAMPLE_FRACTION = 0.01
+APPROX_MIN_SAMPLE_ROWS = 10000
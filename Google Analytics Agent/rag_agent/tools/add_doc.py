@@ -11,6 +11,7 @@ from ..config import (
     DEFAULT_CHUNK_OVERLAP,
     DEFAULT_CHUNK_SIZE,
 )
+from .corpus_catalog import invalidate_catalog
 from .utils import check_corpus_exists, get_corpus_resource_name
 
 def add_doc(
@@ -124,6 +125,8 @@ def add_doc(
             transformation_config=transformation_config,
         )
 
+        invalidate_catalog()
+
         # Set this as the current corpus if not already set
         if not tool_context.state.get("current_corpus"):
             tool_context.state["current_corpus"] = corpus_name
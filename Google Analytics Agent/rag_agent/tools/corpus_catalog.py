@@ -0,0 +1,151 @@
+"""
+Tool for summarizing every Vertex AI RAG corpus and its files in a single call.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Union
+from vertexai import rag
+
+from ..config import (
+    CATALOG_REFRESH_SECONDS,
+    CATALOG_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def source_type(source_uri: str) -> str:
+    """Classify a file by where it was imported from."""
+    if source_uri.startswith("gs://"):
+        return "gcs"
+    if "drive.google.com" in source_uri or "docs.google.com" in source_uri:
+        return "google_drive"
+    return "other"
+
+
+class CorpusCatalogIndex:
+    """
+    Cached summary of all corpora, rebuilt on a background thread when it gets old.
+    Tools that change corpora call invalidate() so the next read sees their changes.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.corpora = None
+        self.refreshed_at = 0.0
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def _summarize(self, corpus) -> Dict[str, Union[str, int]]:
+        """Count files, total size, file dates and source types for one corpus."""
+        file_count = 0
+        total_size = 0
+        last_update = str(corpus.update_time) if hasattr(corpus, "update_time") else ""
+        earliest_create, latest_update = "", ""
+        source_types: Dict[str, int] = {}
+        for rag_file in rag.list_files(corpus.name):
+            file_count += 1
+            total_size += int(getattr(rag_file, "size_bytes", 0) or 0)
+            created = str(rag_file.create_time) if hasattr(rag_file, "create_time") else ""
+            updated = str(rag_file.update_time) if hasattr(rag_file, "update_time") else ""
+            if created and (not earliest_create or created < earliest_create):
+                earliest_create = created
+            latest_update = max(latest_update, updated)
+            last_update = max(last_update, updated)
+            source = source_type(getattr(rag_file, "source_uri", "") or "")
+            source_types[source] = source_types.get(source, 0) + 1
+        return {
+            "resource_name": corpus.name,
+            "display_name": corpus.display_name,
+            "file_count": file_count,
+            "total_size_bytes": total_size,
+            "last_update": last_update,
+            "earliest_create_time": earliest_create,
+            "latest_update_time": latest_update,
+            "source_types": source_types,
+        }
+
+    def _refresh(self) -> None:
+        """Rebuild the index, retrying if it was invalidated during the rebuild."""
+        try:
+            while True:
+                generation = self.generation
+                corpora = list(rag.list_corpora())
+                with ThreadPoolExecutor(max_workers=CATALOG_CONCURRENCY) as executor:
+                    summaries = list(executor.map(self._summarize, corpora))
+                with self.lock:
+                    if generation == self.generation:
+                        self.corpora = summaries
+                        self.refreshed_at = time.time()
+                        return
+        except Exception as e:
+            logger.error(f"Error refreshing corpus catalog: {str(e)}")
+
+    def refresh_async(self) -> threading.Thread:
+        """Start a background refresh unless one is already running."""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._refresh, daemon=True)
+                self.thread.start()
+            return self.thread
+
+    def get(self):
+        """Return the cached summaries, only blocking when there is no usable index."""
+        if self.corpora is None:
+            self.refresh_async().join()
+        elif time.time() - self.refreshed_at > self.ttl:
+            self.refresh_async()
+        return self.corpora, self.refreshed_at
+
+    def invalidate(self) -> None:
+        """Drop the index after a corpus or file changes and rebuild it in the background."""
+        with self.lock:
+            self.generation += 1
+            self.corpora = None
+        self.refresh_async()
+
+
+catalog_index = CorpusCatalogIndex(CATALOG_REFRESH_SECONDS)
+
+
+def invalidate_catalog() -> None:
+    """Mark the corpus catalog as out of date."""
+    catalog_index.invalidate()
+
+
+def corpus_catalog() -> dict:
+    """
+    List every available Vertex AI RAG corpus with a summary of what it contains.
+
+    Returns:
+        dict: The catalog and status, with each corpus containing:
+            - resource_name: The full resource name to use with other tools
+            - display_name: The human-readable name of the corpus
+            - file_count: The number of files in the corpus
+            - total_size_bytes: The combined size of all files
+            - last_update: The most recent update of the corpus or any of its files
+            - earliest_create_time, latest_update_time: The date range of the files
+            - source_types: The number of files imported from each kind of source
+    """
+    try:
+        corpora, refreshed_at = catalog_index.get()
+        if corpora is None:
+            raise RuntimeError("Corpus catalog could not be built")
+
+        corpus_info: List[Dict[str, Union[str, int]]] = list(corpora)
+        return {
+            "status": "success",
+            "message": f"Found {len(corpus_info)} corpora with {sum(c['file_count'] for c in corpus_info)} files in total",
+            "catalog_age_seconds": round(time.time() - refreshed_at, 1),
+            "corpora": corpus_info,
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error building corpus catalog: {str(e)}",
+            "corpora": [],
+        }
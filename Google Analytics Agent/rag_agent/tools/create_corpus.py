@@ -9,6 +9,7 @@ from vertexai import rag
 from ..config import (
     DEFAULT_EMBEDDING_MODEL,
 )
+from .corpus_catalog import invalidate_catalog
 from .utils import check_corpus_exists
 
 def create_corpus(
@@ -60,6 +61,7 @@ def create_corpus(
 
         # Set this as the current corpus
         tool_context.state["current_corpus"] = corpus_name
+        invalidate_catalog()
 
         return {
             "status": "success",
@@ -5,6 +5,7 @@ Tool for deleting a Vertex AI RAG corpus when it's no longer needed.
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
 
+from .corpus_catalog import invalidate_catalog
 from .utils import check_corpus_exists, get_corpus_resource_name
 
 
@@ -53,6 +54,7 @@ def delete_corpus(
         state_key = f"corpus_exists_{corpus_name}"
         if state_key in tool_context.state:
             tool_context.state[state_key] = False
+        invalidate_catalog()
 
         return {
             "status": "success",
@@ -5,6 +5,7 @@ Tool for deleting a specific document from a Vertex AI RAG corpus.
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
 
+from .corpus_catalog import invalidate_catalog
 from .utils import check_corpus_exists, get_corpus_resource_name
 
 
@@ -42,6 +43,7 @@ def delete_doc(
         # Delete the document
         rag_file_path = f"{corpus_resource_name}/ragFiles/{document_id}"
         rag.delete_file(rag_file_path)
+        invalidate_catalog()
 
         return {
             "status": "success",
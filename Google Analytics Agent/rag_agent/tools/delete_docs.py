@@ -0,0 +1,136 @@
+"""
+Tool for deleting many documents from a Vertex AI RAG corpus in one call.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List
+from google.adk.tools.tool_context import ToolContext
+from vertexai import rag
+
+from ..config import (
+    DEFAULT_DELETE_CONCURRENCY,
+)
+from .corpus_catalog import invalidate_catalog
+from .utils import check_corpus_exists, get_corpus_resource_name
+
+
+def _as_datetime(value):
+    """Convert a RagFile timestamp to an aware datetime, or None if unavailable."""
+    if value is None:
+        return None
+    if hasattr(value, "ToDatetime"):
+        value = value.ToDatetime()
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return None
+
+
+def _delete_one(rag_file_path: str) -> dict:
+    """Delete a single file and report the outcome instead of raising."""
+    document_id = rag_file_path.split("/")[-1]
+    try:
+        rag.delete_file(rag_file_path)
+        return {"document_id": document_id, "status": "success"}
+    except Exception as e:
+        return {"document_id": document_id, "status": "error", "message": str(e)}
+
+
+def delete_docs(
+    corpus_name: str,
+    document_ids: List[str],
+    display_name_contains: str,
+    source_uri_prefix: str,
+    older_than_days: int,
+    confirm: bool,
+    tool_context: ToolContext,
+) -> dict:
+    """
+    Delete many documents from a Vertex AI RAG corpus at once, either by ID or by filter.
+    Requires confirmation to prevent accidental deletion.
+
+    Args:
+        corpus_name (str): The full resource name of the corpus containing the documents.
+                          Preferably use the resource_name from list_corpora results.
+        document_ids (List[str]): IDs of the documents to delete. Leave empty to select by filter instead.
+        display_name_contains (str): Only delete files whose display name contains this text. Empty to ignore.
+        source_uri_prefix (str): Only delete files whose source URI starts with this prefix. Empty to ignore.
+        older_than_days (int): Only delete files last updated more than this many days ago. 0 to ignore.
+        confirm (bool): Must be set to True to confirm deletion
+        tool_context (ToolContext): The tool context
+
+    Returns:
+        dict: Status information with a result for every document
+    """
+    # Check if corpus exists, once for the whole batch
+    if not check_corpus_exists(corpus_name, tool_context):
+        return {
+            "status": "error",
+            "message": f"Corpus '{corpus_name}' does not exist",
+            "corpus_name": corpus_name,
+        }
+
+    if not document_ids and not (display_name_contains or source_uri_prefix or older_than_days):
+        return {
+            "status": "error",
+            "message": "Provide document_ids or at least one filter to select documents to delete.",
+            "corpus_name": corpus_name,
+        }
+
+    try:
+        # Get the corpus resource name
+        corpus_resource_name = get_corpus_resource_name(corpus_name)
+
+        # Select files, filters only apply when listing is needed
+        if document_ids:
+            selected = [f"{corpus_resource_name}/ragFiles/{doc_id}" for doc_id in document_ids]
+        else:
+            cutoff = (
+                datetime.now(timezone.utc) - timedelta(days=older_than_days)
+                if older_than_days
+                else None
+            )
+            selected = []
+            for rag_file in rag.list_files(corpus_resource_name):
+                display_name = getattr(rag_file, "display_name", "") or ""
+                source_uri = getattr(rag_file, "source_uri", "") or ""
+                if display_name_contains and display_name_contains.lower() not in display_name.lower():
+                    continue
+                if source_uri_prefix and not source_uri.startswith(source_uri_prefix):
+                    continue
+                if cutoff:
+                    updated = _as_datetime(getattr(rag_file, "update_time", None))
+                    if updated is None or updated >= cutoff:
+                        continue
+                selected.append(rag_file.name)
+
+        # Check if deletion is confirmed, reporting what would be deleted
+        if not confirm:
+            return {
+                "status": "error",
+                "message": f"Deletion requires explicit confirmation. Set confirm=True to delete {len(selected)} document(s).",
+                "corpus_name": corpus_name,
+                "matched_document_ids": [path.split("/")[-1] for path in selected],
+            }
+
+        # Delete concurrently with bounded parallelism
+        with ThreadPoolExecutor(max_workers=DEFAULT_DELETE_CONCURRENCY) as executor:
+            results = list(executor.map(_delete_one, selected))
+        invalidate_catalog()
+
+        deleted = sum(1 for r in results if r["status"] == "success")
+        failed = len(results) - deleted
+        return {
+            "status": "success" if not failed else ("warning" if deleted else "error"),
+            "message": f"Deleted {deleted} of {len(results)} document(s) from corpus '{corpus_name}'",
+            "corpus_name": corpus_name,
+            "deleted_count": deleted,
+            "failed_count": failed,
+            "results": results,
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error deleting documents: {str(e)}",
+            "corpus_name": corpus_name,
+        }
@@ -5,22 +5,111 @@ Tool for retrieving detailed information about a specific RAG corpus.
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
 
+from ..config import (
+    DEFAULT_FILE_PAGE_SIZE,
+)
+from .corpus_catalog import catalog_index, source_type
 from .utils import check_corpus_exists, get_corpus_resource_name
 
+
+def _matches(rag_file, name_filter: str, source_prefix: str) -> bool:
+    """Check a file against the optional name and source filters."""
+    display_name = getattr(rag_file, "display_name", "") or ""
+    source_uri = getattr(rag_file, "source_uri", "") or ""
+    if name_filter and name_filter.lower() not in display_name.lower():
+        return False
+    if source_prefix and not source_uri.startswith(source_prefix):
+        return False
+    return True
+
+
+def _file_info(rag_file) -> dict:
+    """Convert a RagFile to the dict returned to the agent."""
+    return {
+        "file_id": rag_file.name.split("/")[-1],
+        "display_name": (
+            rag_file.display_name if hasattr(rag_file, "display_name") else ""
+        ),
+        "source_uri": (
+            rag_file.source_uri if hasattr(rag_file, "source_uri") else ""
+        ),
+        "create_time": (
+            str(rag_file.create_time) if hasattr(rag_file, "create_time") else ""
+        ),
+        "update_time": (
+            str(rag_file.update_time) if hasattr(rag_file, "update_time") else ""
+        ),
+    }
+
+
+def _catalog_summary(corpus_resource_name: str) -> dict:
+    """Look up the corpus in the cached catalog, None if the catalog is not built yet."""
+    if catalog_index.corpora is None:
+        # Build it in the background for later calls, this one scans the corpus instead
+        catalog_index.refresh_async()
+        return None
+    corpora, _ = catalog_index.get()
+    for corpus in corpora or []:
+        if corpus_resource_name in (corpus["resource_name"], corpus["display_name"]):
+            return {
+                key: corpus.get(key)
+                for key in ("file_count", "total_size_bytes", "earliest_create_time",
+                            "latest_update_time", "source_types")
+            }
+    return None
+
+
+def _summarize_files(corpus_resource_name: str, name_filter: str, source_prefix: str) -> dict:
+    """Stream over every file once, keeping only counters, to build the summary header."""
+    summary = {
+        "file_count": 0,
+        "matching_file_count": 0,
+        "earliest_create_time": "",
+        "latest_update_time": "",
+        "source_types": {},
+    }
+    for rag_file in rag.list_files(corpus_resource_name, page_size=1000):
+        summary["file_count"] += 1
+        if not _matches(rag_file, name_filter, source_prefix):
+            continue
+        summary["matching_file_count"] += 1
+        created = str(rag_file.create_time) if hasattr(rag_file, "create_time") else ""
+        updated = str(rag_file.update_time) if hasattr(rag_file, "update_time") else ""
+        if created and (not summary["earliest_create_time"] or created < summary["earliest_create_time"]):
+            summary["earliest_create_time"] = created
+        summary["latest_update_time"] = max(summary["latest_update_time"], updated)
+        source = source_type(getattr(rag_file, "source_uri", "") or "")
+        summary["source_types"][source] = summary["source_types"].get(source, 0) + 1
+    return summary
+
+
 def get_corpus_info(
     corpus_name: str,
+    page_size: int,
+    page_token: str,
+    name_filter: str,
+    source_prefix: str,
+    full_summary: bool,
     tool_context: ToolContext,
 ) -> dict:
     """
-    Get detailed information about a specific RAG corpus, including its files.
+    Get information about a specific RAG corpus: a summary of its files and one page of file details.
 
     Args:
         corpus_name (str): The full resource name of the corpus to get information about.
                            Preferably use the resource_name from list_corpora results.
+        page_size (int): Number of files to return, 0 to use the default page size
+        page_token (str): The next_page_token from a previous call, empty for the first page.
+                          The summary header is only included on the first page.
+        name_filter (str): Only include files whose display name contains this text. Empty to ignore.
+        source_prefix (str): Only include files whose source URI starts with this prefix. Empty to ignore.
+        full_summary (bool): Scan every file for a summary that also counts the files matching the filters.
+                             Otherwise the file count, date range and source types come from the
+                             cached corpus catalog, or from a scan if the catalog is not built yet.
         tool_context (ToolContext): The tool context
 
     Returns:
-        dict: Information about the corpus and its files
+        dict: Information about the corpus, a page of its files and the token for the next page
     """
     try:
         # Check if corpus exists
@@ -36,63 +125,51 @@ def get_corpus_info(
 
         # Try to get corpus details first
         corpus_display_name = corpus_name  # Default if we can't get actual display name
+        page_size = page_size if page_size and page_size > 0 else DEFAULT_FILE_PAGE_SIZE
 
-        # Process file information
+        # Fetch pages until there is a full page of matching files or no more pages
         file_details = []
-        try:
-            # Get the list of files
-            files = rag.list_files(corpus_resource_name)
-            for rag_file in files:
-                # Get document specific details
+        next_page_token = page_token or None
+        while True:
+            pager = rag.list_files(
+                corpus_resource_name, page_size=page_size, page_token=next_page_token
+            )
+            for rag_file in pager.rag_files:
                 try:
-                    # Extract the file ID from the name
-                    file_id = rag_file.name.split("/")[-1]
-
-                    file_info = {
-                        "file_id": file_id,
-                        "display_name": (
-                            rag_file.display_name
-                            if hasattr(rag_file, "display_name")
-                            else ""
-                        ),
-                        "source_uri": (
-                            rag_file.source_uri
-                            if hasattr(rag_file, "source_uri")
-                            else ""
-                        ),
-                        "create_time": (
-                            str(rag_file.create_time)
-                            if hasattr(rag_file, "create_time")
-                            else ""
-                        ),
-                        "update_time": (
-                            str(rag_file.update_time)
-                            if hasattr(rag_file, "update_time")
-                            else ""
-                        ),
-                    }
-
-                    file_details.append(file_info)
+                    if _matches(rag_file, name_filter, source_prefix):
+                        file_details.append(_file_info(rag_file))
                 except Exception:
                     # Continue to the next file
                     continue
-        except Exception:
-            # Continue without file details
-            pass
+            next_page_token = pager.next_page_token or None
+            if len(file_details) >= page_size or not next_page_token:
+                break
 
-        # Basic corpus info
-        return {
+        result = {
             "status": "success",
             "message": f"Successfully retrieved information for corpus '{corpus_display_name}'",
             "corpus_name": corpus_name,
             "corpus_display_name": corpus_display_name,
-            "file_count": len(file_details),
+            "page_file_count": len(file_details),
             "files": file_details,
+            "next_page_token": next_page_token or "",
         }
+        # Summary header on the first page only, scanning every file only when asked to
+        if not page_token:
+            try:
+                summary = None if full_summary else _catalog_summary(corpus_resource_name)
+                if summary is None:
+                    summary = _summarize_files(corpus_resource_name, name_filter, source_prefix)
+                result["summary"] = summary
+                result["file_count"] = summary["file_count"]
+            except Exception:
+                # Continue without the summary
+                pass
+        return result
 
     except Exception as e:
         return {
             "status": "error",
             "message": f"Error getting corpus information: {str(e)}",
             "corpus_name": corpus_name,
-        }
\ No newline at end of file
+        }
@@ -2,12 +2,26 @@
 Tools for SQL queries.
 """
 
+import math
+import numpy as np
 import pandas as pd
 from google.cloud.sql.connector import Connector
 import sqlalchemy
 from decimal import Decimal
 import os
 
+from ..config import (
+    APPROX_MIN_SAMPLE_ROWS,
+    APPROX_SAMPLE_FRACTION,
+)
+
+# Names used for the random samples kept for approximate queries
+SAMPLE_SUFFIX = "__sample"
+SAMPLE_META_TABLE = "_approx_samples"
+# Version of every table changed by add_table or delete_table, used to invalidate cached answers.
+# The chatbot reads it through table_versions.py, keep the names in sync
+TABLE_VERSIONS_TABLE = "_table_versions"
+
 # Set up SQL connection
 connector = Connector()
 engine = sqlalchemy.create_engine(
@@ -31,6 +45,69 @@ def convert_decimal(obj):
         return [convert_decimal(item) for item in obj]
     return obj
 
+# Helper function to create the bookkeeping tables, before any data transaction since DDL commits implicitly in MySQL
+def create_meta_tables(conn):
+    conn.execute(sqlalchemy.text(
+        f"CREATE TABLE IF NOT EXISTS {SAMPLE_META_TABLE} "
+        "(table_name VARCHAR(255) PRIMARY KEY, sample_table VARCHAR(255), fraction DOUBLE)"
+    ))
+    conn.execute(sqlalchemy.text(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_VERSIONS_TABLE} "
+        "(table_name VARCHAR(255) PRIMARY KEY, version BIGINT NOT NULL)"
+    ))
+
+# Helper function to bump the version of a table, in the transaction that changes it
+def bump_table_version(conn, table):
+    conn.execute(sqlalchemy.text(
+        f"INSERT INTO {TABLE_VERSIONS_TABLE} (table_name, version) VALUES (:table, 1) "
+        "ON DUPLICATE KEY UPDATE version = version + 1"
+    ), {"table": table})
+
+# Helper function to get the sampling fraction for a table of the given number of rows
+def target_fraction(rows):
+    return max(APPROX_SAMPLE_FRACTION, min(1.0, APPROX_MIN_SAMPLE_ROWS / max(rows, 1)))
+
+# Helper function to append rows to a table and its Bernoulli sample in one transaction.
+# The fraction follows the size of the whole table: when the table outgrows it, the existing
+# sample is thinned to the new fraction, so it stays a uniform sample of every row.
+def append_rows(df, table):
+    with engine.begin() as conn:
+        create_meta_tables(conn)
+        # Create missing tables up front, so the load below runs no DDL
+        df.head(0).to_sql(table, conn, if_exists='append', index=False)
+        df.head(0).to_sql(table + SAMPLE_SUFFIX, conn, if_exists='append', index=False)
+
+    with engine.begin() as conn:
+        df.to_sql(table, conn, if_exists='append', index=False)
+        rows = conn.execute(sqlalchemy.text(f"SELECT COUNT(*) FROM `{table}`")).scalar()
+        row = conn.execute(sqlalchemy.text(
+            f"SELECT fraction FROM {SAMPLE_META_TABLE} WHERE table_name = :table FOR UPDATE"
+        ), {"table": table}).fetchone()
+        fraction = target_fraction(rows)
+        if not row and rows > len(df):
+            # Table loaded before samples were kept, sample every row of it, including the new ones
+            columns = ", ".join(f"`{col}`" for col in df.columns)
+            conn.execute(sqlalchemy.text(f"DELETE FROM `{table}{SAMPLE_SUFFIX}`"))
+            conn.execute(sqlalchemy.text(
+                f"INSERT INTO `{table}{SAMPLE_SUFFIX}` ({columns}) SELECT {columns} FROM `{table}` WHERE RAND() < :fraction"
+            ), {"fraction": fraction})
+        else:
+            if row and float(row[0]) > fraction:
+                # Keeping each sampled row with probability new/old gives a sample at the new fraction
+                conn.execute(sqlalchemy.text(
+                    f"DELETE FROM `{table}{SAMPLE_SUFFIX}` WHERE RAND() >= :keep"
+                ), {"keep": fraction / float(row[0])})
+            elif row:
+                fraction = float(row[0])
+            sample = df[np.random.default_rng().random(len(df)) < fraction]
+            sample.to_sql(table + SAMPLE_SUFFIX, conn, if_exists='append', index=False)
+        conn.execute(sqlalchemy.text(
+            f"INSERT INTO {SAMPLE_META_TABLE} (table_name, sample_table, fraction) VALUES (:table, :sample, :fraction) "
+            "ON DUPLICATE KEY UPDATE fraction = :fraction"
+        ), {"table": table, "sample": table + SAMPLE_SUFFIX, "fraction": fraction})
+        bump_table_version(conn, table)
+    return fraction
+
 def sql_query(
     query: str,
 ) -> dict:
@@ -111,11 +188,12 @@ def add_table(
         file_id = url.split('/')[-2]
         download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
         df = pd.read_csv(download_url)
-        df.to_sql(table, engine, if_exists='append', index=False)
+        fraction = append_rows(df, table)
 
         return {
             "status": "success",
             "message": f"Succefully created {table} table",
+            "sample_fraction": fraction,
         }
     except Exception as e:
         return {
@@ -141,6 +219,15 @@ def delete_table(
         if table in sqlalchemy.inspect(engine).get_table_names():
             table_obj = sqlalchemy.Table(table, sqlalchemy.MetaData(), autoload_with=engine)
             table_obj.drop(engine)
+            # Drop the approximate query sample as well
+            with engine.begin() as conn:
+                conn.execute(sqlalchemy.text(f"DROP TABLE IF EXISTS `{table}{SAMPLE_SUFFIX}`"))
+                create_meta_tables(conn)
+            with engine.begin() as conn:
+                conn.execute(sqlalchemy.text(
+                    f"DELETE FROM {SAMPLE_META_TABLE} WHERE table_name = :table"
+                ), {"table": table})
+                bump_table_version(conn, table)
             return {
                 "status": "success",
                 "message": f"Succefully deleted {table} table",
@@ -169,7 +256,10 @@ def list_tables() -> dict:
     """    
 
     try:
-        tables = sqlalchemy.inspect(engine).get_table_names()
+        tables = [
+            name for name in sqlalchemy.inspect(engine).get_table_names()
+            if not name.endswith(SAMPLE_SUFFIX) and name not in (SAMPLE_META_TABLE, TABLE_VERSIONS_TABLE)
+        ]
         return {
             "status": "success",
             "message": f"Succefully listed tables",
@@ -180,4 +270,89 @@ def list_tables() -> dict:
             "status": "error",
             "message": f"Error listing table: {str(e)}",
         }
-    
\ No newline at end of file
+
+def approx_query(
+    table : str,
+    column : str,
+    aggregate : str,
+    group_by : str,
+    where : str,
+) -> dict:
+
+    """
+    Estimate an aggregate on a large table from its random sample, with 95% confidence intervals.
+    Much faster than sql_query for exploratory or trend questions that do not need exact numbers.
+
+    Args:
+        table (str): The name of the table to aggregate
+        column (str): The column to aggregate, ignored for count
+        aggregate (str): One of "sum", "count" or "avg"
+        group_by (str): The column to group by, empty for a single total
+        where (str): An SQL filter condition without the WHERE keyword, empty for no filter
+
+    Returns:
+        dict: The status and an estimate with confidence interval for every group
+    """
+
+    try:
+        aggregate = aggregate.lower()
+        if aggregate not in ("sum", "count", "avg"):
+            raise ValueError("aggregate must be one of sum, count or avg")
+
+        with engine.connect() as conn:
+            if SAMPLE_META_TABLE not in sqlalchemy.inspect(conn).get_table_names():
+                raise ValueError("No samples available, use sql_query instead")
+            row = conn.execute(sqlalchemy.text(
+                f"SELECT sample_table, fraction FROM {SAMPLE_META_TABLE} WHERE table_name = :table"
+            ), {"table": table}).fetchone()
+            if not row:
+                raise ValueError(f"No sample available for {table}, use sql_query instead")
+            sample_table, fraction = row[0], float(row[1])
+
+            # Count, sum and sum of squares per group are enough for every estimator
+            value = "1" if aggregate == "count" else f"`{column}`"
+            group = f"`{group_by}` AS grp, " if group_by else ""
+            query = (
+                f"SELECT {group}COUNT({value}) AS n, SUM({value}) AS s, SUM({value} * {value}) AS ss "
+                f"FROM `{sample_table}`"
+            )
+            if where:
+                query += f" WHERE {where}"
+            if group_by:
+                query += f" GROUP BY `{group_by}`"
+            rows = conn.execute(sqlalchemy.text(query)).fetchall()
+
+        results = []
+        for r in rows:
+            r = convert_decimal(r._asdict())
+            n, s, ss = float(r["n"] or 0), float(r["s"] or 0), float(r["ss"] or 0)
+            if aggregate == "count":
+                estimate = n / fraction
+                se = math.sqrt(n * (1 - fraction)) / fraction
+            elif aggregate == "sum":
+                estimate = s / fraction
+                se = math.sqrt((1 - fraction) * ss) / fraction
+            else:
+                estimate = s / n if n else None
+                variance = (ss - s * s / n) / (n - 1) if n > 1 else 0.0
+                se = math.sqrt(max(variance, 0.0) / n * (1 - fraction)) if n else None
+            results.append({
+                "group": r.get("grp"),
+                "estimate": estimate,
+                "ci_low": estimate - 1.96 * se if se is not None else None,
+                "ci_high": estimate + 1.96 * se if se is not None else None,
+                "sample_rows": int(n),
+            })
+
+        return {
+            "status": "success",
+            "message": f"Estimated {aggregate} from a {fraction:.2%} sample of {table}, intervals are 95% confidence",
+            "sample_fraction": fraction,
+            "result": results,
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error running approximate query: {str(e)}",
+            "result": "",
+        }
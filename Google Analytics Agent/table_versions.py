@@ -0,0 +1,40 @@
+# Version stamps of the SQL tables, read by the answer cache without importing the agent package
+import os
+import threading
+import sqlalchemy
+
+# Table written by add_table and delete_table in rag_agent/tools/sql.py, keep the names in sync
+TABLE_VERSIONS_TABLE = "_table_versions"
+
+engine = None
+engine_lock = threading.Lock()
+
+# Helper function to connect to the agent's Cloud SQL database on first use
+def get_engine():
+    global engine
+    with engine_lock:
+        if engine is None:
+            from google.cloud.sql.connector import Connector
+            connector = Connector()
+            engine = sqlalchemy.create_engine(
+                "mysql+pymysql://",
+                creator=lambda: connector.connect(
+                    os.environ["DB_STRING"],
+                    "pymysql",
+                    user=os.environ["DB_USER"],
+                    password=os.environ["DB_PASS"],
+                    db=os.environ["DB_NAME"],
+                ),
+            )
+        return engine
+
+# Current version of every table, 0 for tables never changed through the agent's tools
+def table_versions():
+    with get_engine().connect() as conn:
+        tables = sqlalchemy.inspect(conn).get_table_names()
+        versions = {}
+        if TABLE_VERSIONS_TABLE in tables:
+            versions = dict(conn.execute(sqlalchemy.text(
+                f"SELECT table_name, version FROM {TABLE_VERSIONS_TABLE}"
+            )).fetchall())
+    return {table: str(versions.get(table, 0)) for table in tables}